@@ -5,6 +5,16 @@ from .mili import (
     pack_component,
     get_font_cache,
     clear_font_cache,
+    get_text_cache_stats,
+    clear_text_cache,
+    set_text_cache_budget,
+    clear_glyph_cache,
+    get_image_cache_stats,
+    clear_image_cache,
+    set_image_cache_budget,
+    get_markdown_image_cache_stats,
+    clear_markdown_image_cache,
+    set_markdown_image_cache_budget,
     set_number_modifier,
     smart_number,
 )
@@ -94,6 +104,16 @@ __all__ = (
     "pack_component",
     "get_font_cache",
     "clear_font_cache",
+    "get_text_cache_stats",
+    "clear_text_cache",
+    "set_text_cache_budget",
+    "clear_glyph_cache",
+    "get_image_cache_stats",
+    "clear_image_cache",
+    "set_image_cache_budget",
+    "get_markdown_image_cache_stats",
+    "clear_markdown_image_cache",
+    "set_markdown_image_cache_budget",
     "set_number_modifier",
     "smart_number",
     "RESIZE",
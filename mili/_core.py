@@ -5,6 +5,7 @@ from mili import data as _data
 from mili import typing as _typing
 from mili import _coreutils
 from mili import _richtext
+from mili import _glyphs
 from pygame._sdl2 import video as pgvideo
 
 if typing.TYPE_CHECKING:
@@ -25,9 +26,223 @@ class _PushStylesCtx:
         self._mili.pop_styles()
 
 
+class _ElementChildren:
+    __slots__ = ("children", "children_grid", "children_fillx", "children_filly")
+
+    def __init__(self):
+        self.children: list[_Element] = []
+        self.children_grid: list[_Element] = []
+        self.children_fillx: list[_Element] = []
+        self.children_filly: list[_Element] = []
+
+    def clear(self):
+        self.children.clear()
+        self.children_grid.clear()
+        self.children_fillx.clear()
+        self.children_filly.clear()
+
+
+class _Element:
+    __slots__ = (
+        "rect",
+        "abs_rect",
+        "style",
+        "id",
+        "components",
+        "parent",
+        "top",
+        "z",
+        "hovered",
+        "is_parent",
+        "fillx",
+        "filly",
+        "filla",
+        "cd",
+        "grid",
+        "cache",
+        "constraint",
+        "cstyle",
+        "layout_key",
+        "layout",
+        "old_rect",
+        "old_abs_rect",
+        "old_components",
+        "old_children",
+        "old_parent_id",
+        "old_grid",
+        "drawn",
+        "drawn_frame",
+        "layer",
+        "_rect_back",
+        "_abs_rect_back",
+        "_components_back",
+        "_cd_front",
+        "_cd_back",
+    )
+
+    def __init__(self, id_, rect, style, parent, is_parent):
+        self.rect: pygame.Rect = rect
+        self.abs_rect: pygame.Rect = rect.copy()
+        self.style: dict[str, typing.Any] = style
+        self.id: int = id_
+        self.components: list[dict[str, typing.Any]] = []
+        self.parent: _Element | None = parent
+        self.top = False
+        self.z = 1
+        self.hovered = False
+        self.is_parent = is_parent
+        self.fillx = False
+        self.filly = False
+        self.filla = 0
+        self.cd: _ElementChildren | None = None
+        self.grid: dict[str, typing.Any] | None = None
+        self.cache: _data.ParentCache | None = None
+        self.constraint = None
+        self.cstyle: typing.Any = None
+        self.layout_key: list | None = None
+        self.layout: tuple | None = None
+        self.old_rect = pygame.Rect()
+        self.old_abs_rect = pygame.Rect()
+        self.old_components = []
+        self.old_children = ()
+        self.old_parent_id = 0
+        self.old_grid = None
+        self.drawn: tuple | None = None
+        self.drawn_frame = 0
+        self.layer: _Layer | None = None
+        self._rect_back = pygame.Rect()
+        self._abs_rect_back = pygame.Rect()
+        self._components_back = []
+        self._cd_front: _ElementChildren | None = None
+        self._cd_back: _ElementChildren | None = None
+
+    # mapping access kept for custom components written against the old dicts
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def _own_children(self) -> _ElementChildren:
+        cd = self._cd_back
+        if cd is None:
+            cd = _ElementChildren()
+        else:
+            cd.clear()
+        self._cd_back = self._cd_front
+        self._cd_front = cd
+        return cd
+
+
+class _Layer:
+    __slots__ = ("target", "key", "key_frame", "drawn_key")
+
+    def __init__(self):
+        self.target: pygame.Surface | pgvideo.Texture | None = None
+        self.key: list | None = None
+        self.key_frame = -1
+        self.drawn_key: list | None = None
+
+
+class _SpatialIndex:
+    __slots__ = ("cell_size", "cells", "large", "count")
+
+    # elements covering more cells are kept in a list checked one by one
+    max_cells = 64
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list] = {}
+        self.large = []
+        self.count = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.large.clear()
+        self.count = 0
+
+    def insert(self, element: _Element, rect: pygame.Rect, blocking: bool):
+        if rect.w <= 0 or rect.h <= 0:
+            return
+        size = self.cell_size
+        entry = (element, rect, blocking, self.count)
+        self.count += 1
+        x0, y0 = rect.x // size, rect.y // size
+        x1, y1 = (rect.right - 1) // size, (rect.bottom - 1) // size
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_cells:
+            self.large.append(entry)
+            return
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy), None)
+                if cell is None:
+                    cells[(cx, cy)] = [entry]
+                else:
+                    cell.append(entry)
+
+    def at(self, point, blocking_only=False) -> list[_Element]:
+        size = self.cell_size
+        x, y = point[0], point[1]
+        entries = [
+            entry
+            for entry in self.cells.get((int(x // size), int(y // size)), ())
+            if entry[1].collidepoint(x, y)
+        ]
+        entries += [entry for entry in self.large if entry[1].collidepoint(x, y)]
+        return self._sorted(entries, blocking_only)
+
+    def within(self, rect: pygame.Rect, blocking_only=False) -> list[_Element]:
+        size = self.cell_size
+        found = {}
+        for cx in range(rect.x // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.y // size, (rect.bottom - 1) // size + 1):
+                for entry in self.cells.get((cx, cy), ()):
+                    if entry[1].colliderect(rect):
+                        found[entry[3]] = entry
+        for entry in self.large:
+            if entry[1].colliderect(rect):
+                found[entry[3]] = entry
+        return self._sorted(found.values(), blocking_only)
+
+    def _sorted(self, entries, blocking_only) -> list[_Element]:
+        # topmost first, the first inserted wins between equal z indexes
+        return [
+            entry[0]
+            for entry in sorted(entries, key=lambda e: (-e[0].z, e[3]))
+            if entry[2] or not blocking_only
+        ]
+
+
+class _CompiledStyle:
+    __slots__ = ("raw", "version")
+
+
+_COMPILED_STYLES: dict[str, type[_CompiledStyle]] = {
+    major: type(
+        f"_Compiled{major.title().replace('_', '')}Style",
+        (_CompiledStyle,),
+        {"__slots__": tuple(field[0] for field in fields)},
+    )
+    for major, fields in _coreutils._STYLE_FIELDS.items()
+}
+
+
 class _globalctx:
     _sample_surf = pygame.Surface((10, 10), pygame.SRCALPHA)
     _font_cache = {}
+    # outputs shared by text and image components without a cache object
+    _text_cache = _coreutils._SharedCache(16 * 1024 * 1024)
+    _image_cache = _coreutils._SharedCache(64 * 1024 * 1024)
     _component_types: dict[str, str | _typing.ComponentProtocol] = dict.fromkeys(
         ["rect", "circle", "line", "polygon", "line", "text", "image", "image_layer"],
         "builtin",
@@ -36,6 +251,12 @@ class _globalctx:
     _mili: "_MILI|None" = None
     _update_ids: dict[str, list[typing.Callable]] = {}
 
+    @classmethod
+    def _get_mouse_pos(cls) -> tuple[float, float]:
+        if cls._mili is None:
+            return pygame.mouse.get_pos()
+        return tuple(cls._mili._ctx._mouse_pos)
+
     @classmethod
     def _register_update_id(cls, uid, method):
         if uid is None:
@@ -48,34 +269,19 @@ class _globalctx:
 class _ctx:
     def __init__(self, mili: "_MILI"):
         self._mili = mili
-        self._parent: dict[str, typing.Any] = {
-            "rect": pygame.Rect(0, 0, 1, 1),
-            "abs_rect": pygame.Rect(0, 0, 1, 1),
-            "style": {},
-            "id": 0,
-            "cd": {
-                "children": [],
-                "children_grid": [],
-                "children_fillx": [],
-                "children_filly": [],
-            },
-            "components": [],
-            "parent": None,
-            "top": False,
-            "z": 0,
-            "hovered": False,
-            "is_parent": True,
-        }
+        self._root = _Element(0, pygame.Rect(0, 0, 1, 1), {}, None, True)
+        self._root.z = 0
+        self._root.cd = self._root._own_children()
+        self._parent: _Element = self._root
         self._coreutils = _coreutils
-        self._stack: dict[str, typing.Any] = self._parent
+        self._stack: _Element = self._parent
         self._parents_stack = [self._stack]
         self._id = 1
-        self._memory: dict[int, dict[str, typing.Any]] = {}
-        self._old_data: dict[int, dict[str, typing.Any]] = {}
+        self._memory: dict[int, _Element] = {}
         self._interaction_cache: dict[int, _data.Interaction] = {}
-        self._element: dict[str, typing.Any] = self._parent
+        self._element: _Element = self._parent
         self._canva: _canva._AbstractCanva = None  # type: ignore
-        self._abs_hovered: list[dict[str, typing.Any]] = []
+        self._spatial = _SpatialIndex()
         self._started = False
         self._started_pressing_element = None
         self._started_pressing_button = -1
@@ -83,21 +289,39 @@ class _ctx:
         self._mouse_pos = pygame.Vector2()
         self._mouse_rel = pygame.Vector2()
         self._global_mouse = False
-        self._gmouse_pressed = [False] * 5
-        self._gmouse_just_pressed = [False] * 5
-        self._gmouse_just_released = [False] * 5
-        self._get_just_pressed_func: typing.Callable = pygame.mouse.get_just_pressed
-        self._get_just_released_func: typing.Callable = pygame.mouse.get_just_released
+        self._input = _data.InputSnapshot(
+            (0, 0), (False,) * 5, (False,) * 5, (False,) * 5
+        )
+        self._next_input: tuple | None = None
+        self._pressed_button = -1
+        self._just_pressed_button = -1
+        self._just_released_button = -1
         self._image_layer_caches: list[_data.ImageLayerCache] = []
         self._cleared = 0
         self._inside_cache = -1
         self._static_cache = False
         self._last_checkpoint = 0
+        self._styles_version = 0
+        self._retained = False
+        self._frame_reused = False
+        self._frame_stream = []
+        self._last_frame_stream = None
+        self._frame_elements: list[_Element] = []
+        self._frame = 0
+        self._input_state = None
+        self._last_input_state = None
+        self._input_changed = True
+        self._settled = False
+        self._top: _Element | None = None
+        self._drawn_elements: list[_Element] = []
+        self._drawn_frame = 0
+        self._drawn_version = 0
+        self._layer_rendering: _Element | None = None
         self._styles = {}
         self._styles_stack = []
         self._prefabs = {}
         self._dummy_interaction = _data.Interaction(
-            mili, False, -1, -1, -1, False, False, 0, {}
+            mili, False, -1, -1, -1, False, False, 0, self._root
         )
         self._default_styles = {
             "element": {},
@@ -124,110 +348,116 @@ class _ctx:
             else:
                 style = self._styles.get("element", {}).copy()
                 style.update(arg_style)
-        old_el = self._memory.get(self._id, None)
-        if self._inside_cache != -1 and old_el:
+        if self._retained:
+            self._frame_stream.append(
+                (
+                    self._id,
+                    None if rect is None else pygame.Rect(rect),
+                    style,
+                    did_begin,
+                )
+            )
+        element = self._memory.get(self._id, None)
+        if self._inside_cache != -1 and element is not None:
             if self._static_cache:
                 self._z += 1
                 self._id += 1
-                return old_el, self._dummy_interaction
+                return element, self._dummy_interaction
             else:
-                ret_interaction = self._get_interaction(old_el, old_el)
-                old_el.update(top=False, hovered=False, style=style, components=[])
-                self._element = old_el
+                ret_interaction = self._get_interaction(element, True)
+                element.top = False
+                element.hovered = False
+                element.style = style
+                self._compile_element_style(element)
+                self._recycle_buffers(element)
+                element.abs_rect.update(element.old_abs_rect)
+                if self._retained:
+                    self._frame_elements.append(element)
+                self._element = element
                 self._z += 1
                 self._id += 1
-                return old_el, ret_interaction
-        if rect is None:
-            rect = pygame.Rect()
-            absrect = pygame.Rect()
-        else:
-            rect = pygame.Rect(rect)
-            absrect = rect.copy()
+                return element, ret_interaction
         parent = self._parent
         if "parent_id" in style:
             if style["parent_id"] in self._memory:
                 parent = self._memory[style["parent_id"]]
             elif style["parent_id"] == 0:
                 parent = self._stack
-        element: dict[str, typing.Any] = {
-            "rect": rect,
-            "abs_rect": absrect,
-            "style": style,
-            "id": self._id,
-            "components": [],
-            "parent": parent,
-            "top": False,
-            "z": 1,
-            "hovered": False,
-            "is_parent": did_begin,
-            "fillx": False,
-            "filly": False,
-            "cd": {
-                "children": [],
-                "children_grid": [],
-                "children_fillx": [],
-                "children_filly": [],
-            }
-            if did_begin
-            else {},
-        }
+        oldr = None
+        if element is None:
+            element = _Element(
+                self._id,
+                pygame.Rect() if rect is None else pygame.Rect(rect),
+                style,
+                parent,
+                did_begin,
+            )
+            self._compile_element_style(element)
+            interaction = self._get_interaction(element, False)
+            self._memory[self._id] = element
+        else:
+            element.style = style
+            self._compile_element_style(element)
+            interaction = self._get_interaction(element, True)
+            oldr = element.old_rect
+            self._recycle_element(element, rect, parent, did_begin)
+        if self._retained:
+            self._frame_elements.append(element)
+        rect = element.rect
+        absrect = element.abs_rect
+        cstyle = element.cstyle
         cache = None
         if did_begin:
-            cache = self._style_val(style, "element", "cache", None)
-            if cache is not None:
-                element["cache"] = cache
-                if not cache._rebuild:
-                    element["cd"] = cache._cache
-                    element["grid"] = cache._grid
+            cache = cstyle.cache
+            if cache is None:
+                element.cd = element._own_children()
+            else:
+                element.cache = cache
+                if cache._rebuild:
+                    # the cache keeps the lists, they must not be recycled
+                    element.cd = _ElementChildren()
+                else:
+                    element.cd = cache._cache
+                    element.grid = cache._grid
                     self._inside_cache = self._id
                     self._static_cache = cache._static
-        cache_size = self._style_val(style, "element", "cache_rect_size", False)
-        oldr = None
-        if cache_size and old_el:
-            oldr = old_el["rect"]
+        cache_size = cstyle.cache_rect_size
+        if cache_size and oldr is not None:
             rect.w = absrect.w = oldr.w
             rect.h = absrect.h = oldr.h
-        constraint = self._style_val(style, "element", "size_clamp", None)
+        constraint = cstyle.size_clamp
         if constraint:
-            element["constraint"] = constraint
+            element.constraint = constraint
             rect.w = absrect.w = self._constrain(rect.w, constraint, 0)
             rect.h = absrect.h = self._constrain(rect.h, constraint, 1)
-        interaction = self._get_interaction(element, old_el)
-        if old_el:
-            oldr = old_el["rect"]
-            old_el.update(element)
-        else:
-            old_el = element
-        self._memory[self._id] = old_el
-        element = old_el
         if parent:
             z = self._z
-            cd = parent["cd"]
+            cd = parent.cd
             if "z" in style:
                 z = style["z"]
-            if parent["z"] > z:
-                z = parent["z"] + len(cd["children"]) + 1
-            cd["children"].append(element)
-            if not self._style_val(style, "element", "ignore_grid", False):
-                cd["children_grid"].append(element)
-                fillx = self._style_val(style, "element", "fillx", False)
-                filly = self._style_val(style, "element", "filly", False)
+            if parent.z > z:
+                z = parent.z + len(cd.children) + 1
+            cd.children.append(element)
+            if not cstyle.ignore_grid:
+                cd.children_grid.append(element)
+                fillx = cstyle.fillx
+                filly = cstyle.filly
                 if fillx:
-                    element["fillx"] = fillx
-                    cd["children_fillx"].append(element)
+                    element.fillx = fillx
+                    cd.children_fillx.append(element)
                     if oldr is not None:
                         rect.w = absrect.w = oldr.w
                 if filly:
-                    element["filly"] = filly
-                    cd["children_filly"].append(element)
+                    element.filly = filly
+                    cd.children_filly.append(element)
                     if oldr is not None:
                         rect.h = absrect.h = oldr.h
                 if oldr is not None:
-                    if fillx and self._style_val(style, "element", "resizey", False):
+                    if fillx and cstyle.resizey:
                         rect.h = absrect.h = oldr.h
-                    if filly and self._style_val(style, "element", "resizex", False):
+                    if filly and cstyle.resizex:
                         rect.w = absrect.w = oldr.w
-            element["z"] = z + 1
+            element.z = z + 1
         self._id += 1
         self._element = element
         self._z += 1
@@ -236,21 +466,71 @@ class _ctx:
                 cache._size = rect.size
                 cache._style = style
                 cache._rebuild = True
-                element["cd"] = {
-                    "children": [],
-                    "children_grid": [],
-                    "children_fillx": [],
-                    "children_filly": [],
-                }
-                cache._cache = element["cd"]
+                element.cd = _ElementChildren()
+                cache._cache = element.cd
                 cache._grid = None
                 self._inside_cache = -1
                 self._static_cache = False
         return element, interaction
 
+    def _recycle_buffers(self, element: _Element):
+        # the previous buffers stay untouched for this frame's element data
+        components = element._components_back
+        components.clear()
+        element._components_back = element.components
+        element.components = components
+        abs_rect = element._abs_rect_back
+        element._abs_rect_back = element.abs_rect
+        element.abs_rect = abs_rect
+
+    def _recycle_element(self, element: _Element, rect, parent, did_begin):
+        new_rect = element._rect_back
+        if rect is None:
+            new_rect.update(0, 0, 0, 0)
+        else:
+            new_rect.update(rect)
+        element._rect_back = element.rect
+        element.rect = new_rect
+        self._recycle_buffers(element)
+        element.abs_rect.update(new_rect)
+        element.parent = parent
+        element.top = False
+        element.z = 1
+        element.is_parent = did_begin
+        element.fillx = False
+        element.filly = False
+        element.cd = None
+        element.cache = None
+        element.constraint = None
+
     def _style_val(self, style: dict, major, minor, default):
         return style.get(minor, self._default_styles[major].get(minor, default))
 
+    def _compile_style(self, style: dict, major) -> typing.Any:
+        cstyle = _COMPILED_STYLES[major]()
+        cstyle.raw = style
+        cstyle.version = self._styles_version
+        default_styles = self._default_styles
+        for name, defaults_major, default, fallback in _coreutils._STYLE_FIELDS[major]:
+            if fallback is not None:
+                default = getattr(cstyle, fallback)
+            setattr(
+                cstyle,
+                name,
+                style.get(name, default_styles[defaults_major].get(name, default)),
+            )
+        return cstyle
+
+    def _compile_element_style(self, element: _Element, force=False):
+        cstyle = element.cstyle
+        if (
+            force
+            or cstyle is None
+            or cstyle.version != self._styles_version
+            or cstyle.raw != element.style
+        ):
+            element.cstyle = self._compile_style(element.style.copy(), "element")
+
     def _organize_grid(
         self,
         element,
@@ -275,7 +555,7 @@ class _ctx:
     ):
         rectav = getattr(rect, av)
         rectoav = getattr(rect, oav)
-        grid_align = self._style_val(style, "element", "grid_align", "first")
+        grid_align = element.cstyle.grid_align
         _coreutils._check_align_grid(grid_align)
         spacea = _coreutils._abs_perc(
             self._style_val(style, "element", f"grid_space{a}", space),
@@ -311,24 +591,32 @@ class _ctx:
                 if maxoa is not None:
                     maxresizeoa = maxoa
 
-        for child in element["cd"][f"children_fill{a}"]:
-            ch_fill_a = child.get(f"fill{a}", False)
+        cd = element.cd
+        resized = False
+        for child in cd.children_fillx if a == "x" else cd.children_filly:
+            ch_fill_a = child.fillx if a == "x" else child.filly
             if ch_fill_a is True:
                 ch_fill_a = "100"
             fill_a_v = _coreutils._abs_perc(ch_fill_a, rectav)
-            setattr(child["rect"], av, fill_a_v)
+            prev = getattr(child.rect, av)
+            setattr(child.rect, av, fill_a_v)
+            if getattr(child.rect, av) != prev:
+                resized = True
             self._organize_element(child)
 
-        for child in element["cd"][f"children_fill{oa}"]:
-            ch_fill_oa = child.get(f"fill{oa}", False)
+        for child in cd.children_fillx if oa == "x" else cd.children_filly:
+            ch_fill_oa = child.fillx if oa == "x" else child.filly
             if ch_fill_oa is True:
                 ch_fill_oa = "100"
             fill_oa_v = _coreutils._abs_perc(ch_fill_oa, rectoav)
-            setattr(child["rect"], oav, fill_oa_v)
+            prev = getattr(child.rect, oav)
+            setattr(child.rect, oav, fill_oa_v)
+            if getattr(child.rect, oav) != prev:
+                resized = True
             self._organize_element(child)
 
         for child in children:
-            ch_rect = child["rect"]
+            ch_rect = child.rect
             add = spacea
             if line_size_a <= 0:
                 add = 0
@@ -414,7 +702,7 @@ class _ctx:
                 if len(elements) > 1:
                     spacinga = max(
                         0,
-                        (padded_a - sum([getattr(e["rect"], av) for e in elements]))
+                        (padded_a - sum([getattr(e.rect, av) for e in elements]))
                         / (len(elements) - 1),
                     )
                 else:
@@ -428,7 +716,7 @@ class _ctx:
             elif grid_align == "last_center":
                 current_pos_a = padded_a / 2 + longest_line_size_a / 2 - line_size
             for el in elements:
-                el_rect = el["rect"]
+                el_rect = el.rect
                 setattr(el_rect, oa, current_pos_oa)
                 setattr(el_rect, a, current_pos_a)
                 current_pos_a += getattr(el_rect, av)
@@ -436,7 +724,7 @@ class _ctx:
             current_pos_oa += biggest_size
             current_pos_oa += spacing
 
-        element["grid"] = {
+        element.grid = {
             f"overflow{oa}": max(0, lines_size_oa - padded_oa),
             f"overflow{a}": max(0, longest_line_size_a - padded_a),
             f"pad{a}": pada,
@@ -445,21 +733,49 @@ class _ctx:
             f"space{a}": spacea,
             f"space{oa}": spaceoa,
         }
-        if (cache := element.get("cache", None)) is not None:
-            cache._cache = element["cd"]
-            cache._rebuild = False
-            cache._grid = element["grid"]
+        return resized
 
-    def _organize_element(self, element: dict[str, typing.Any]):
-        if not element["is_parent"]:
+    def _organize_element(self, element: _Element):
+        if not element.is_parent:
             return
         if self._inside_cache != -1:
             return
-        style = element["style"]
-        rect = element["rect"]
-        cd = element["cd"]
-        children = cd["children_grid"]
-        a = self._style_val(style, "element", "axis", "y")
+        rect = element.rect
+        children = element.cd.children_grid
+        layout_key = [element.cstyle, rect.w, rect.h]
+        for child in children:
+            ch_rect = child.rect
+            layout_key += (child, child.cstyle, ch_rect.w, ch_rect.h)
+        if self._cleared <= 0 and layout_key == element.layout_key:
+            # same inputs as the last layout, reuse its results
+            w, h, grid, rects = element.layout
+            rect.w, rect.h = w, h
+            for child, ch_rect in zip(children, rects):
+                child.rect.update(ch_rect)
+            element.grid = grid
+        elif self._organize_layout(element):
+            # fill children were resized, results depend on their subtrees
+            element.layout_key = None
+        else:
+            element.layout_key = layout_key
+            element.layout = (
+                rect.w,
+                rect.h,
+                element.grid,
+                [tuple(child.rect) for child in children],
+            )
+        if (cache := element.cache) is not None:
+            cache._cache = element.cd
+            cache._rebuild = False
+            cache._grid = element.grid
+
+    def _organize_layout(self, element: _Element) -> bool:
+        style = element.style
+        cstyle = element.cstyle
+        rect = element.rect
+        cd = element.cd
+        children = cd.children_grid
+        a = cstyle.axis
         if a not in ["x", "y"]:
             raise error.MILIValueError(f"Invalid axis {a}")
         oa = "x" if a == "y" else "y"
@@ -467,28 +783,26 @@ class _ctx:
         oav = "w" if av == "h" else "h"
         ai = 0 if a == "x" else 1
         oai = 1 if a == "x" else 0
-        pad = self._style_val(style, "element", "pad", 5)
-        pada = self._style_val(style, "element", f"pad{a}", pad)
-        padoa = self._style_val(style, "element", f"pad{oa}", pad)
+        if a == "x":
+            pada, padoa = cstyle.padx, cstyle.pady
+            resizea, resizeoa = cstyle.resizex, cstyle.resizey
+            _filla, _filloa = cstyle.fillx, cstyle.filly
+        else:
+            pada, padoa = cstyle.pady, cstyle.padx
+            resizea, resizeoa = cstyle.resizey, cstyle.resizex
+            _filla, _filloa = cstyle.filly, cstyle.fillx
+        resizea, resizeoa = bool(resizea), bool(resizeoa)
         rectav = getattr(rect, av)
         rectoav = getattr(rect, oav)
         pada, padoa = (
             _coreutils._abs_perc(pada, rectav),
             _coreutils._abs_perc(padoa, rectoav),
         )
-        space = _coreutils._abs_perc(
-            self._style_val(style, "element", "spacing", 3), rectav
-        )
-        anchor = self._style_val(style, "element", "anchor", "first")
-        def_align = self._style_val(style, "element", "default_align", "first")
+        space = _coreutils._abs_perc(cstyle.spacing, rectav)
+        anchor = cstyle.anchor
+        def_align = cstyle.default_align
         _coreutils._check_anchor(anchor)
-        resizeoa = bool(self._style_val(style, "element", f"resize{oa}", False))
-        resizea = bool(self._style_val(style, "element", f"resize{a}", False))
-        constraint = element.get("constraint", None)
-        _filloa, _filla = (
-            self._style_val(style, "element", f"fill{oa}", False),
-            self._style_val(style, "element", f"fill{a}", False),
-        )
+        constraint = element.constraint
         if resizeoa and bool(_filloa) is not False:
             raise error.MILIIncompatibleStylesError(
                 f"Cannot have resize{oa} True and fill{oa} not False"
@@ -501,12 +815,12 @@ class _ctx:
         padded_oa = rectoav - padoa * 2
         padded_a = rectav - pada * 2
 
-        layout = self._style_val(style, "element", "layout", "stack")
+        layout = cstyle.layout
         if layout == "table":
             # organize table
             ...
-        elif layout == "grid" or self._style_val(style, "element", "grid", False):
-            self._organize_grid(
+        elif layout == "grid" or cstyle.grid:
+            return self._organize_grid(
                 element,
                 a,
                 oa,
@@ -527,18 +841,18 @@ class _ctx:
                 ai,
                 oai,
             )
-            return
 
-        elements_with_filloa = cd[f"children_fill{oa}"]
-        elements_with_filla = cd[f"children_fill{a}"]
+        resized = False
+        elements_with_filloa = cd.children_fillx if oa == "x" else cd.children_filly
+        elements_with_filla = cd.children_fillx if a == "x" else cd.children_filly
         biggest_oa = 0
         fixed_elements_a = 0
 
         for el in children:
-            el_rect = el["rect"]
-            el_filloa = el.get(f"fill{oa}", False)
-            el_filla = el.get(f"fill{a}", False)
-            el_constraint = el.get("constraint", None)
+            el_rect = el.rect
+            el_filloa = el.fillx if oa == "x" else el.filly
+            el_filla = el.fillx if a == "x" else el.filly
+            el_constraint = el.constraint
             if (
                 bool(el_filloa) is False
                 or (
@@ -565,33 +879,32 @@ class _ctx:
             available_to_filla = 0
 
         for filloa_el in elements_with_filloa:
-            el_rect = filloa_el["rect"]
-            el_style = filloa_el["style"]
-            filloa = filloa_el[f"fill{oa}"]
+            el_rect = filloa_el.rect
+            filloa = filloa_el.fillx if oa == "x" else filloa_el.filly
             if filloa is True:
                 filloa = "100"
             el_filloa = self._constrain(
                 _coreutils._abs_perc(filloa, padded_oa),
-                filloa_el.get("constraint", None),
+                filloa_el.constraint,
                 oai,
             )
             prev = getattr(el_rect, oav)
             if prev != el_filloa or self._cleared > 0:
                 setattr(el_rect, oav, el_filloa)
+                if getattr(el_rect, oav) != prev:
+                    resized = True
                 self._organize_element(filloa_el)
 
         filla_totalsize = 0
         for filla_el in elements_with_filla:
-            el_rect = filla_el["rect"]
-            el_style = filla_el["style"]
-            filla = filla_el[f"fill{a}"]
+            filla = filla_el.fillx if a == "x" else filla_el.filly
             if filla is True:
                 filla = "100"
             el_filla = _coreutils._abs_perc(
                 filla,
                 available_to_filla,
             )
-            filla_el["filla"] = el_filla
+            filla_el.filla = el_filla
             filla_totalsize += el_filla
 
         total_a = fixed_elements_a
@@ -600,14 +913,16 @@ class _ctx:
             if filla_totalsize > available_to_filla:
                 multiplier = available_to_filla / filla_totalsize
             for filla_el in elements_with_filla:
-                el_rect = filla_el["rect"]
+                el_rect = filla_el.rect
                 val = self._constrain(
-                    filla_el["filla"] * multiplier, filla_el.get("constraint", None), ai
+                    filla_el.filla * multiplier, filla_el.constraint, ai
                 )
                 total_a += val + space
                 prev = getattr(el_rect, av)
                 if val != prev or self._cleared > 0:
                     setattr(el_rect, av, val)
+                    if getattr(el_rect, av) != prev:
+                        resized = True
                     self._organize_element(filla_el)
 
         current_a = pada
@@ -617,7 +932,7 @@ class _ctx:
                 spacing = max(
                     0,
                     (
-                        (padded_a - sum([getattr(e["rect"], av) for e in children]))
+                        (padded_a - sum([getattr(e.rect, av) for e in children]))
                         / (len(children) - 1)
                     ),
                 )
@@ -628,9 +943,8 @@ class _ctx:
         if anchor == "center":
             current_a = max(pada, rectav / 2 - total_a / 2)
         for el in children:
-            el_rect = el["rect"]
-            el_style = el["style"]
-            el_align = self._style_val(el_style, "element", "align", def_align)
+            el_rect = el.rect
+            el_align = self._style_val(el.style, "element", "align", def_align)
             _coreutils._check_align(el_align)
             setattr(el_rect, a, current_a)
             current_a += getattr(el_rect, av) + spacing
@@ -641,7 +955,7 @@ class _ctx:
             if el_align == "center":
                 setattr(el_rect, f"center{oa}", rectoav / 2)
 
-        element["grid"] = {
+        element.grid = {
             f"overflow{oa}": max(0, biggest_oa - padded_oa),
             f"overflow{a}": max(0, total_a - padded_a),
             f"pad{a}": pada,
@@ -650,10 +964,7 @@ class _ctx:
             "spacex": space,
             "spacey": space,
         }
-        if (cache := element.get("cache", None)) is not None:
-            cache._cache = element["cd"]
-            cache._rebuild = False
-            cache._grid = element["grid"]
+        return resized
 
     def _constrain(self, value, constraint, vi):
         if constraint is None:
@@ -668,35 +979,24 @@ class _ctx:
 
     def _start(self, style, winpos):
         self._canva._start()
-        self._parent = {
-            "rect": self._canva._rect.copy(),
-            "abs_rect": self._canva._rect.copy(),
-            "style": style,
-            "id": 0,
-            "cd": {
-                "children": [],
-                "children_grid": [],
-                "children_fillx": [],
-                "children_filly": [],
-            },
-            "components": [],
-            "parent": None,
-            "top": False,
-            "z": 0,
-            "hovered": False,
-            "is_parent": True,
-        }
+        root = self._root
+        if 0 in self._memory:
+            self._get_old_el(root)
+        self._recycle_element(root, self._canva._rect, None, True)
+        root.style = style
+        self._compile_element_style(root)
+        root.z = 0
+        root.hovered = False
+        root.cd = root._own_children()
+        self._parent = root
         self._id = 1
         self._element = self._parent
         self._stack = self._parent
         self._parents_stack = [self._parent]
-        self._abs_hovered = []
         self._started = True
         self._z = 0
-        mouse_pos = (
-            pygame.Vector2(pygame.mouse.get_pos(self._global_mouse))
-            - self._canva._offset
-        )
+        inp = self._input = self._get_input()
+        mouse_pos = pygame.Vector2(inp.position) - self._canva._offset
         if self._global_mouse:
             if winpos:
                 mouse_pos -= winpos
@@ -706,100 +1006,135 @@ class _ctx:
                 )
         self._mouse_rel = mouse_pos - self._mouse_pos
         self._mouse_pos = mouse_pos
-        if 0 in self._memory:
-            self._get_old_el(self._stack, None)
-        self._memory[0] = self._stack
-
-        if self._global_mouse:
-            global_pressed = pygame.mouse.get_pressed(5, True)
-            for i, (old, new) in enumerate(zip(self._gmouse_pressed, global_pressed)):
-                if old == new:
-                    self._gmouse_just_pressed[i] = False
-                    self._gmouse_just_released[i] = False
-                elif old and not new:
-                    self._gmouse_just_released[i] = True
-                    self._gmouse_just_pressed[i] = False
-                elif new and not old:
-                    self._gmouse_just_pressed[i] = True
-                    self._gmouse_just_released[i] = False
-            self._gmouse_pressed = global_pressed
-
-        if (btn := _coreutils._get_first_button(self._get_just_pressed_func())) > -1:
-            self._started_pressing_button = btn
-        if (
-            _coreutils._get_first_button(self._get_just_released_func())
-            == self._started_pressing_button
-        ):
+        self._memory[0] = root
+
+        just_pressed = inp.just_pressed
+        just_released = inp.just_released
+        self._pressed_button = _coreutils._get_first_button(inp.pressed)
+        self._just_pressed_button = _coreutils._get_first_button(just_pressed)
+        self._just_released_button = _coreutils._get_first_button(just_released)
+        if self._just_pressed_button > -1:
+            self._started_pressing_button = self._just_pressed_button
+        if self._just_released_button == self._started_pressing_button:
             self._started_pressing_button = -1
             self._started_pressing_element = None
         for layer_cache in self._image_layer_caches:
             layer_cache._caches_activity = {}
             layer_cache._rendered = False
 
-    def _get_just_pressed(self):
-        return self._gmouse_just_pressed
+        self._frame += 1
+        self._last_input_state = self._input_state
+        if any(just_pressed) or any(just_released):
+            self._input_state = None
+        else:
+            self._input_state = (tuple(mouse_pos), inp.pressed)
+        self._input_changed = (
+            self._input_state is None or self._input_state != self._last_input_state
+        )
+        if self._retained:
+            self._last_frame_stream = self._frame_stream
+            self._frame_stream = [
+                (self._canva, tuple(self._canva._rect), style, self._styles_version)
+            ]
+            self._frame_elements = [root]
+
+    def _retained_unchanged(self) -> bool:
+        # the stream can hold unhashable styles and data, so it's compared as is
+        return (
+            self._settled
+            and self._cleared <= 0
+            and not self._input_changed
+            and self._frame_stream == self._last_frame_stream
+            and self._canva._retain_ready()
+        )
 
-    def _get_just_released(self):
-        return self._gmouse_just_released
+    def _reuse_frame(self):
+        # layout and draw are skipped, bring back the results of the last drawn frame
+        for element in self._frame_elements:
+            element.rect.update(element.old_rect)
+            element.abs_rect.update(element.old_abs_rect)
+            element.grid = element.old_grid
+        if self._top is not None:
+            self._top.top = True
+
+    def _retain_frame(self, top: _Element | None):
+        self._top = top
+        # layouts depending on the previous sizes might need another frame to settle
+        self._settled = all(
+            element.rect == element.old_rect
+            and element.abs_rect == element.old_abs_rect
+            for element in self._frame_elements
+        )
 
-    def _check_interaction(self, element: dict[str, typing.Any]):
-        blocking = self._style_val(element["style"], "element", "blocking", True)
-        if not blocking and blocking is not None:
-            return
-        parent = element["parent"]
-        clipdraw = (
-            True
-            if parent is None
-            else self._style_val(parent["style"], "element", "clip_draw", True)
+    def _get_input(self) -> _data.InputSnapshot:
+        old_pressed = self._input.pressed
+        if self._next_input is not None:
+            position, pressed, wheel = self._next_input
+            self._next_input = None
+            pressed = tuple(pressed[:5]) + (False,) * (5 - len(pressed))
+        else:
+            position = pygame.mouse.get_pos(self._global_mouse)
+            pressed = tuple(pygame.mouse.get_pressed(5, self._global_mouse))
+            wheel = (0, 0)
+            if not self._global_mouse:
+                return _data.InputSnapshot(
+                    position,
+                    pressed,
+                    tuple(pygame.mouse.get_just_pressed()),
+                    tuple(pygame.mouse.get_just_released()),
+                    wheel,
+                )
+        # pygame only tracks the buttons of the window, compare with the last state
+        return _data.InputSnapshot(
+            tuple(position),
+            pressed,
+            tuple(new and not old for old, new in zip(old_pressed, pressed)),
+            tuple(old and not new for old, new in zip(old_pressed, pressed)),
+            tuple(wheel),
         )
-        hover = element["abs_rect"].collidepoint(self._mouse_pos)
-        parent_hover = True
-        if parent is not None and clipdraw:
-            parent_hover = parent["abs_rect"].collidepoint(self._mouse_pos)
-        if hover and parent_hover:
-            self._abs_hovered.append(element)
-
-    def _get_old_el(self, element, old_el):
-        if old_el is None:
-            old_el = self._memory[element["id"]]
-        self._old_data[element["id"]] = {
-            "rect": old_el["rect"],
-            "abs_rect": old_el["abs_rect"],
-            "components": old_el["components"],
-            "children": old_el["cd"].get("children", ()),
-            "parent_id": old_el["parent"]["id"] if old_el["parent"] else -1,
-            "grid": old_el["grid"] if "grid" in old_el else None,
-        }
-        return old_el
 
-    def _get_interaction(
-        self, element: dict[str, typing.Any], old_el
-    ) -> "_data.Interaction":
-        if old_el is None:
+    def _check_interaction(self, element: _Element):
+        blocking = element.cstyle.blocking
+        parent = element.parent
+        if parent is not None and (parent.cstyle.clip_draw or parent.cstyle.layer):
+            rect = element.abs_rect.clip(parent.abs_rect)
+        else:
+            rect = element.abs_rect.copy()
+        self._spatial.insert(element, rect, blocking or blocking is None)
+
+    def _get_old_el(self, element: _Element):
+        element.old_rect = element.rect
+        element.old_abs_rect = element.abs_rect
+        element.old_components = element.components
+        element.old_children = () if element.cd is None else element.cd.children
+        element.old_parent_id = -1 if element.parent is None else element.parent.id
+        element.old_grid = element.grid
+
+    def _get_interaction(self, element: _Element, existed) -> "_data.Interaction":
+        if not existed:
             return _coreutils._partial_interaction(self, element, False)
-        old_el = self._get_old_el(element, old_el)
-        absolute_hover = old_el["abs_rect"].collidepoint(self._mouse_pos)
-        if old_el["top"]:
-            if self._style_val(element["style"], "element", "blocking", True) is None:
-                self._dummy_interaction._raw_data = old_el
+        self._get_old_el(element)
+        absolute_hover = element.old_abs_rect.collidepoint(self._mouse_pos)
+        if element.top:
+            if element.cstyle.blocking is None:
+                self._dummy_interaction._raw_data = element
                 self._dummy_interaction._data = None
                 return self._dummy_interaction
             if (
                 self._started_pressing_button > -1
                 and self._started_pressing_element is None
             ):
-                self._started_pressing_element = element["id"]
+                self._started_pressing_element = element.id
                 return _coreutils._total_interaction(
                     self,
                     element,
                     absolute_hover,
                     absolute_hover,
                     False,
-                    old_el,
                 )
             if (
                 self._started_pressing_button > -1
-                and element["id"] != self._started_pressing_element
+                and element.id != self._started_pressing_element
             ):
                 return _coreutils._partial_interaction(self, element, absolute_hover)
             return _coreutils._total_interaction(
@@ -808,12 +1143,11 @@ class _ctx:
                 absolute_hover,
                 absolute_hover,
                 False,
-                old_el,
             )
         else:
             if (
                 self._started_pressing_button > -1
-                and element["id"] == self._started_pressing_element
+                and element.id == self._started_pressing_element
             ):
                 return _coreutils._total_interaction(
                     self,
@@ -821,7 +1155,6 @@ class _ctx:
                     absolute_hover,
                     False,
                     True,
-                    old_el,
                 )
             return _coreutils._partial_interaction(self, element, absolute_hover)
 
@@ -841,7 +1174,12 @@ class _ctx:
                 style.update(arg_style)
         if type in ["text", "image"]:
             cache = self._style_val(style, type, "cache", None)
-            if cache == "auto":
+            # the shared caches are used instead unless a cache object is needed
+            if cache == "auto" and (
+                self._style_val(style, "text", "rich", False)
+                if type == "text"
+                else self._style_val(style, "image", "layer_cache", None) is not None
+            ):
                 style["cache"] = (
                     _data.ImageCache.get_next_cache()
                     if type == "image"
@@ -858,21 +1196,44 @@ class _ctx:
             raise error.MILIStatusError(
                 "Cannot add component to previous element if no element was created"
             )
+        compobj = _globalctx._component_types[type]
+        cstyle = None
+        if isinstance(compobj, str):
+            cstyle = self._component_cstyle(element, type, style)
         if type == "text":
-            rich = self._style_val(style, "text", "rich", False)
+            rich = cstyle.rich
             cache = None
             if rich:
-                cache = self._style_val(style, "text", "cache", None)
+                cache = cstyle.cache
                 if cache is None:
                     raise error.MILIStatusError(
                         "Rich text requires a valid TextCache object for the cache style"
                     )
-                _richtext._comp_init(self, data, style, cache, element["rect"].size)
-            self._text_resize(element["rect"], data, style, rich, cache)
-        compobj = _globalctx._component_types[type]
-        if not isinstance(compobj, str):
+                _richtext._comp_init(self, data, style, cache, element.rect.size)
+            self._text_resize(element.rect, data, cstyle, rich, cache)
+        if cstyle is None:
             compobj.added(self, data, style, element)
-        element["components"].append({"type": type, "data": data, "style": style})
+        element.components.append(
+            {"type": type, "data": data, "style": style, "cstyle": cstyle}
+        )
+        if self._retained:
+            self._frame_stream.append((type, data, style))
+
+    def _component_cstyle(self, element: _Element, type, style):
+        # components usually keep their position and style between frames
+        index = len(element.components)
+        old_components = element.old_components
+        if index < len(old_components):
+            old = old_components[index]
+            cstyle = old.get("cstyle", None)
+            if (
+                cstyle is not None
+                and old["type"] == type
+                and cstyle.version == self._styles_version
+                and old["style"] == style
+            ):
+                return cstyle
+        return self._compile_style(style, type)
 
     def _get_font(self, style) -> pygame.Font:
         path = self._style_val(style, "text", "name", None)
@@ -894,33 +1255,155 @@ class _ctx:
             _globalctx._font_cache[key] = font
         return _globalctx._font_cache[key]
 
+    def _shared_text(
+        self,
+        data,
+        font,
+        fontalign,
+        fontdir,
+        antialias,
+        color,
+        bg_color,
+        bold,
+        italic,
+        underline,
+        strikethrough,
+        wraplen,
+        outline_color,
+    ):
+        canva = self._canva
+        key = (
+            str(data),
+            font,
+            fontalign,
+            fontdir,
+            antialias,
+            _coreutils._color_key(color),
+            _coreutils._color_key(bg_color),
+            bold,
+            italic,
+            underline,
+            strikethrough,
+            max(0, int(wraplen)),
+            _coreutils._color_key(outline_color),
+            canva._renderer if canva.backend == "renderer" else None,
+        )
+        surf = _globalctx._text_cache.get(key)
+        if surf is not None:
+            return surf
+        surf = _coreutils._render_text(
+            data,
+            font,
+            fontalign,
+            fontdir,
+            antialias,
+            color,
+            bg_color,
+            bold,
+            italic,
+            underline,
+            strikethrough,
+            wraplen,
+            outline_color,
+            canva,
+        )
+        _globalctx._text_cache.put(key, surf)
+        return surf
+
+    def _shared_image(
+        self,
+        rect: pygame.Rect,
+        data,
+        padx,
+        pady,
+        do_fill,
+        do_stretchx,
+        do_stretchy,
+        fill_color,
+        border_radius,
+        alpha,
+        smoothscale,
+        nine_patch,
+        transforms,
+        filters,
+        shared=True,
+    ):
+        canva = self._canva
+        key = None
+        if shared:
+            size = rect.size
+            if not (canva.backend == "surface" or smoothscale or do_fill or nine_patch):
+                # the renderer scales the image when it is rendered
+                size = None
+            key = (
+                data,
+                size,
+                padx,
+                pady,
+                do_fill,
+                do_stretchx,
+                do_stretchy,
+                _coreutils._color_key(fill_color),
+                border_radius
+                if isinstance(border_radius, float | int)
+                else tuple(border_radius),
+                alpha,
+                smoothscale,
+                nine_patch,
+                _coreutils._callables_key(transforms),
+                _coreutils._callables_key(filters),
+                canva._renderer if canva.backend == "renderer" else None,
+            )
+            try:
+                output = _globalctx._image_cache.get(key)
+            except TypeError:
+                # unhashable transform or filter arguments
+                key = None
+            else:
+                if output is not None:
+                    return output
+        output = _coreutils._get_image(
+            rect,
+            data,
+            padx,
+            pady,
+            do_fill,
+            do_stretchx,
+            do_stretchy,
+            fill_color,
+            border_radius,
+            alpha,
+            smoothscale,
+            nine_patch,
+            transforms,
+            filters,
+            canva,
+        )
+        if key is not None:
+            # the key holds the source image, so its size is charged too
+            _globalctx._image_cache.put(key, output, data.width * data.height * 4)
+        return output
+
     def _draw_comp_rect(self, data, style, el, rect: pygame.Rect):
-        color = self._style_val(style, "rect", "color", "black")
+        color = style.color
         if color is None:
             return
-        ready_rect = self._style_val(style, "rect", "ready_rect", None)
-        pad = self._style_val(style, "rect", "pad", 0)
-        padx = self._style_val(style, "rect", "padx", pad)
-        pady = self._style_val(style, "rect", "pady", pad)
+        ready_rect = style.ready_rect
         padx, pady = (
-            int(_coreutils._abs_perc(padx, rect.w)),
-            int(_coreutils._abs_perc(pady, rect.h)),
-        )
-        outline = int(
-            _coreutils._abs_perc(
-                self._style_val(style, "rect", "outline", 0), min(rect.w, rect.h)
-            )
+            int(_coreutils._abs_perc(style.padx, rect.w)),
+            int(_coreutils._abs_perc(style.pady, rect.h)),
         )
-        br_style = self._style_val(style, "rect", "border_radius", 7)
+        outline = int(_coreutils._abs_perc(style.outline, min(rect.w, rect.h)))
+        br_style = style.border_radius
         border_radius = _coreutils._border_radius(br_style, rect.w, rect.h)
         if ready_rect:
             draw_rect = ready_rect
         else:
-            aspect_ratio = self._style_val(style, "rect", "aspect_ratio", None)
+            aspect_ratio = style.aspect_ratio
             if aspect_ratio is None:
                 draw_rect = rect.inflate(-padx * 2, -pady * 2)
             else:
-                align = self._style_val(style, "rect", "align", "center")
+                align = style.align
                 availx, availy = rect.w - padx * 2, rect.h - pady * 2
                 rx, ry = availx, availy
                 rx = availy * aspect_ratio
@@ -930,8 +1413,8 @@ class _ctx:
                 draw_rect = pygame.Rect((0, 0), (rx, ry)).move_to(
                     **_coreutils._align_rect(align, rect, padx, pady)
                 )
-        dash_size = self._style_val(style, "line", "dash_size", None)
-        dash_offset = self._style_val(style, "line", "dash_offset", 0)
+        dash_size = style.dash_size
+        dash_offset = style.dash_offset
         _coreutils._draw_rect(
             self._canva,
             color,
@@ -943,27 +1426,20 @@ class _ctx:
         )
 
     def _draw_comp_circle(self, data, style, el, rect: pygame.Rect):
-        color = self._style_val(style, "circle", "color", "black")
+        color = style.color
         if color is None:
             return
-        pad = self._style_val(style, "circle", "pad", 0)
-        padx = self._style_val(style, "circle", "padx", pad)
-        pady = self._style_val(style, "circle", "pady", pad)
         padx, pady = (
-            int(_coreutils._abs_perc(padx, rect.w)),
-            int(_coreutils._abs_perc(pady, rect.h)),
+            int(_coreutils._abs_perc(style.padx, rect.w)),
+            int(_coreutils._abs_perc(style.pady, rect.h)),
         )
-        outline = int(
-            _coreutils._abs_perc(
-                self._style_val(style, "circle", "outline", 0), min(rect.w, rect.h)
-            )
-        )
-        antialias = self._style_val(style, "circle", "antialias", False)
+        outline = int(_coreutils._abs_perc(style.outline, min(rect.w, rect.h)))
+        antialias = style.antialias
         circle_rect = rect.inflate(-padx * 2, -pady * 2)
-        aspect_ratio = self._style_val(style, "circle", "aspect_ratio", None)
-        corners = self._style_val(style, "circle", "corners", None)
+        aspect_ratio = style.aspect_ratio
+        corners = style.corners
         if aspect_ratio is not None:
-            align = self._style_val(style, "circle", "align", "center")
+            align = style.align
             rx, ry = circle_rect.w, circle_rect.h
             rx = circle_rect.h * aspect_ratio
             if rx > circle_rect.w:
@@ -972,8 +1448,8 @@ class _ctx:
             circle_rect = pygame.Rect((0, 0), (rx, ry)).move_to(
                 **_coreutils._align_rect(align, rect, padx, pady)
             )
-        dash_size = self._style_val(style, "line", "dash_size", None)
-        dash_anchor = self._style_val(style, "line", "dash_anchor", 25)
+        dash_size = style.dash_size
+        dash_anchor = style.dash_anchor
         _coreutils._draw_circle(
             self._canva,
             circle_rect,
@@ -988,16 +1464,13 @@ class _ctx:
     def _draw_comp_polygon(
         self, data: list[tuple[int, int]], style, el, rect: pygame.Rect
     ):
-        color = self._style_val(style, "polygon", "color", "black")
+        color = style.color
         if color is None:
             return
         points = []
-        pad = self._style_val(style, "line", "pad", 0)
-        padx = self._style_val(style, "line", "padx", pad)
-        pady = self._style_val(style, "line", "pady", pad)
         padx, pady = (
-            int(_coreutils._abs_perc(padx, rect.w)),
-            int(_coreutils._abs_perc(pady, rect.h)),
+            int(_coreutils._abs_perc(style.padx, rect.w)),
+            int(_coreutils._abs_perc(style.pady, rect.h)),
         )
         cx, cy = rect.centerx, rect.centery
         if self._canva.backend == "renderer":
@@ -1010,26 +1483,19 @@ class _ctx:
             if pady * 2 < rect.h:
                 ry = pygame.math.clamp(ry, -rect.h // 2 + pady, rect.h // 2 - pady)
             points.append((cx + rx, cy + ry))
-        outline = int(
-            _coreutils._abs_perc(
-                self._style_val(style, "polygon", "outline", 0), min(rect.w, rect.h)
-            )
-        )
+        outline = int(_coreutils._abs_perc(style.outline, min(rect.w, rect.h)))
         self._canva._draw_poly(color, points, outline, rect)
 
     def _draw_comp_line(
         self, data: list[tuple[int, int]], style, el, rect: pygame.Rect
     ):
-        color = self._style_val(style, "line", "color", "black")
+        color = style.color
         if color is None:
             return
         points = []
-        pad = self._style_val(style, "line", "pad", 0)
-        padx = self._style_val(style, "line", "padx", pad)
-        pady = self._style_val(style, "line", "pady", pad)
         padx, pady = (
-            int(_coreutils._abs_perc(padx, rect.w)),
-            int(_coreutils._abs_perc(pady, rect.h)),
+            int(_coreutils._abs_perc(style.padx, rect.w)),
+            int(_coreutils._abs_perc(style.pady, rect.h)),
         )
         for raw_p in data:
             rx, ry = raw_p
@@ -1041,62 +1507,74 @@ class _ctx:
             points.append((rect.centerx + int(rx), rect.centery + int(ry)))
         if len(points) != 2:
             raise error.MILIValueError("Wrong number of points")
-        size = _coreutils._abs_perc(
-            self._style_val(style, "line", "size", 1), min(rect.w, rect.h)
-        )
-        antialias = self._style_val(style, "line", "antialias", False)
-        dash_size = self._style_val(style, "line", "dash_size", None)
-        dash_offset = self._style_val(style, "line", "dash_offset", 0)
+        size = _coreutils._abs_perc(style.size, min(rect.w, rect.h))
+        antialias = style.antialias
+        dash_size = style.dash_size
+        dash_offset = style.dash_offset
         width = max(1, int(size))
         _coreutils._draw_line(
             self._canva, antialias, width, color, points, dash_size, dash_offset
         )
 
     def _draw_comp_text(self, data: str, style, el, rect: pygame.Rect):
-        blit_flags = self._style_val(style, "text", "blit_flags", 0)
-        align = self._style_val(style, "text", "align", "center")
-        padx = self._style_val(style, "text", "padx", 5)
-        pady = self._style_val(style, "text", "pady", 3)
-        pad = self._style_val(style, "text", "pad", None)
+        blit_flags = style.blit_flags
+        align = style.align
+        padx = style.padx
+        pady = style.pady
+        pad = style.pad
         if pad is not None:
             padx = pady = pad
         padx, pady = (
             _coreutils._abs_perc(padx, rect.w),
             _coreutils._abs_perc(pady, rect.h),
         )
-        rich = self._style_val(style, "text", "rich", False)
+        rich = style.rich
         if rich:
-            cache = self._style_val(style, "text", "cache", False)
-            actions = self._style_val(style, "text", "rich_actions", {})
+            cache = style.cache
+            actions = style.rich_actions
             _richtext._render(self, cache, rect, blit_flags, align, padx, pady, actions)
             return
-        font = self._get_font(style)
-        cache = style.get("cache", None)
-        fontalign = _coreutils._FONT_ALIGNS[
-            self._style_val(style, "text", "font_align", pygame.FONT_CENTER)
-        ]
-        fontdir = _coreutils._FONT_DIRS[
-            self._style_val(style, "text", "font_direction", pygame.DIRECTION_LTR)
-        ]
-        bold = self._style_val(style, "text", "bold", False)
-        italic = self._style_val(style, "text", "italic", False)
-        underline = self._style_val(style, "text", "underline", False)
-        strikethrough = self._style_val(style, "text", "strikethrough", False)
-        antialias = self._style_val(style, "text", "antialias", True)
-        color = self._style_val(style, "text", "color", "white")
-        bg_color = self._style_val(style, "text", "bg_color", None)
-        outline_col = self._style_val(style, "text", "outline_color", None)
+        font = self._get_font_from(style.name, style.size, style.sysfont)
+        cache = style.raw.get("cache", None)
+        fontalign = _coreutils._FONT_ALIGNS[style.font_align]
+        fontdir = _coreutils._FONT_DIRS[style.font_direction]
+        bold = style.bold
+        italic = style.italic
+        underline = style.underline
+        strikethrough = style.strikethrough
+        antialias = style.antialias
+        color = style.color
+        bg_color = style.bg_color
+        outline_col = style.outline_color
 
         growx, growy = (
-            self._style_val(style, "text", "growx", False),
-            self._style_val(style, "text", "growy", True),
+            style.growx,
+            style.growy,
         )
 
-        wraplen = _coreutils._abs_perc(
-            self._style_val(style, "text", "wraplen", 0), rect.w - padx * 2
-        )
-        if cache is None:
-            surf = _coreutils._render_text(
+        wraplen = _coreutils._abs_perc(style.wraplen, rect.w - padx * 2)
+        if style.glyph_atlas and _glyphs._supported(wraplen, fontdir):
+            _glyphs._draw_text(
+                self._canva,
+                data,
+                font,
+                fontalign,
+                (bold, italic, underline, strikethrough),
+                antialias,
+                color,
+                bg_color,
+                outline_col,
+                align,
+                rect,
+                padx,
+                pady,
+                growx,
+                growy,
+                blit_flags,
+            )
+            return
+        if cache is None or cache == "auto":
+            surf = self._shared_text(
                 data,
                 font,
                 fontalign,
@@ -1110,15 +1588,18 @@ class _ctx:
                 strikethrough,
                 wraplen,
                 outline_col,
-                self._canva,
             )
         else:
-            if cache._cache is None:
-                new_cache = {
-                    "font": font,
-                    "style": style,
-                    "data": data,
-                }
+            _cache = cache._cache
+            if (
+                _cache is None
+                or data != _cache["data"]
+                # an identical style reuses the same compiled style object
+                or (
+                    _cache["cstyle"] is not style
+                    and (font is not _cache["font"] or style.raw != _cache["style"])
+                )
+            ):
                 surf = _coreutils._render_text(
                     data,
                     font,
@@ -1135,40 +1616,15 @@ class _ctx:
                     outline_col,
                     self._canva,
                 )
-                new_cache["output"] = surf
-                cache._cache = new_cache
+                cache._cache = {
+                    "font": font,
+                    "style": style.raw,
+                    "cstyle": style,
+                    "data": data,
+                    "output": surf,
+                }
             else:
-                _cache = cache._cache
-                if (
-                    font is not _cache["font"]
-                    or data != _cache["data"]
-                    or style != _cache["style"]
-                ):
-                    new_cache = {
-                        "font": font,
-                        "data": data,
-                        "style": style,
-                    }
-                    surf = _coreutils._render_text(
-                        data,
-                        font,
-                        fontalign,
-                        fontdir,
-                        antialias,
-                        color,
-                        bg_color,
-                        bold,
-                        italic,
-                        underline,
-                        strikethrough,
-                        wraplen,
-                        outline_col,
-                        self._canva,
-                    )
-                    new_cache["output"] = surf
-                    cache._cache = new_cache
-                else:
-                    surf = _cache["output"]
+                surf = _cache["output"]
         sw, sh = surf.width, surf.height
         if growy and sh > rect.h + pady * 2:
             rect.h = sh + pady * 2
@@ -1191,11 +1647,26 @@ class _ctx:
         font.align = _coreutils._FONT_ALIGNS[
             self._style_val(style, "text", "font_align", pygame.FONT_CENTER)
         ]
-        font.set_direction(
-            _coreutils._FONT_DIRS[
-                self._style_val(style, "text", "font_direction", pygame.DIRECTION_LTR)
-            ]
-        )
+        fontdir = _coreutils._FONT_DIRS[
+            self._style_val(style, "text", "font_direction", pygame.DIRECTION_LTR)
+        ]
+        if self._style_val(style, "text", "glyph_atlas", False) and _glyphs._supported(
+            _coreutils._abs_perc(self._style_val(style, "text", "wraplen", 0), 0),
+            fontdir,
+        ):
+            return _glyphs._text_size(
+                data,
+                font,
+                font.align,
+                (
+                    self._style_val(style, "text", "bold", False),
+                    self._style_val(style, "text", "italic", False),
+                    self._style_val(style, "text", "underline", False),
+                    self._style_val(style, "text", "strikethrough", False),
+                ),
+                self._style_val(style, "text", "outline_color", None),
+            )
+        font.set_direction(fontdir)
         if self._style_val(style, "text", "slow_grow", False):
             wraplen = _coreutils._abs_perc(
                 self._style_val(style, "text", "wraplen", 0), 0
@@ -1207,14 +1678,14 @@ class _ctx:
 
     def _text_resize(self, rect: pygame.Rect, data, style, rich, cache):
         growx, growy = (
-            self._style_val(style, "text", "growx", False),
-            self._style_val(style, "text", "growy", True),
+            style.growx,
+            style.growy,
         )
         if not growx and not growy:
             return
-        padx = self._style_val(style, "text", "padx", 5)
-        pady = self._style_val(style, "text", "pady", 3)
-        pad = self._style_val(style, "text", "pad", None)
+        padx = style.padx
+        pady = style.pady
+        pad = style.pad
         if pad is not None:
             padx = pady = pad
         padx, pady = (
@@ -1223,28 +1694,31 @@ class _ctx:
         )
         if rich:
             sw, sh = cache._rich["size"]
+        elif style.glyph_atlas and _glyphs._supported(
+            _coreutils._abs_perc(style.wraplen, rect.w - padx * 2),
+            _coreutils._FONT_DIRS[style.font_direction],
+        ):
+            sw, sh = _glyphs._text_size(
+                data,
+                self._get_font_from(style.name, style.size, style.sysfont),
+                _coreutils._FONT_ALIGNS[style.font_align],
+                (style.bold, style.italic, style.underline, style.strikethrough),
+                style.outline_color,
+            )
         else:
-            slow_grow = self._style_val(style, "text", "slow_grow", False)
-            font = self._get_font(style)
+            slow_grow = style.slow_grow
+            font = self._get_font_from(style.name, style.size, style.sysfont)
             if slow_grow:
-                fontalign = _coreutils._FONT_ALIGNS[
-                    self._style_val(style, "text", "font_align", pygame.FONT_CENTER)
-                ]
-                fontdir = _coreutils._FONT_DIRS[
-                    self._style_val(
-                        style, "text", "font_direction", pygame.DIRECTION_LTR
-                    )
-                ]
-                wraplen = _coreutils._abs_perc(
-                    self._style_val(style, "text", "wraplen", 0), rect.w - padx * 2
-                )
-                cache = style.get("cache", None)
-                if cache is not None and cache._cache is not None:
+                fontalign = _coreutils._FONT_ALIGNS[style.font_align]
+                fontdir = _coreutils._FONT_DIRS[style.font_direction]
+                wraplen = _coreutils._abs_perc(style.wraplen, rect.w - padx * 2)
+                cache = style.raw.get("cache", None)
+                if cache not in (None, "auto") and cache._cache is not None:
                     _cache = cache._cache
                     if (
                         font == _cache["font"]
                         and data == _cache["data"]
-                        and style == _cache["style"]
+                        and style.raw == _cache["style"]
                     ):
                         output = cache._cache["output"]
                         sw, sh = output.width, output.height
@@ -1272,8 +1746,8 @@ class _ctx:
     def _draw_comp_image(self, data: pygame.Surface, style, el, rect: pygame.Rect):
         if data is None or self._canva is None:
             return
-        ready = self._style_val(style, "image", "ready", False)
-        blit_flags = self._style_val(style, "image", "blit_flags", 0)
+        ready = style.ready
+        blit_flags = style.blit_flags
         istex = False
         if ready or (istex := isinstance(data, pgvideo.Texture)):
             output = data
@@ -1282,42 +1756,41 @@ class _ctx:
                 nine_patch = 0
                 do_fill = False
                 smoothscale = False
-                pad = self._style_val(style, "image", "pad", 0)
-                padx = self._style_val(style, "image", "padx", pad)
-                pady = self._style_val(style, "image", "pady", pad)
                 padx, pady = (
-                    _coreutils._abs_perc(padx, rect.w),
-                    _coreutils._abs_perc(pady, rect.h),
+                    _coreutils._abs_perc(style.padx, rect.w),
+                    _coreutils._abs_perc(style.pady, rect.h),
                 )
-                do_stretchx = self._style_val(style, "image", "stretchx", False)
-                do_stretchy = self._style_val(style, "image", "stretchy", False)
+                do_stretchx = style.stretchx
+                do_stretchy = style.stretchy
         else:
-            cache = style.get("cache", None)
-            layer_cache = style.get("layer_cache", None)
+            cache = style.raw.get("cache", None)
+            # surfaces are compared by identity, so sharing is opt in since a
+            # surface modified in place would keep showing its old content
+            shared = cache == "auto"
+            if shared:
+                cache = None
+            layer_cache = style.raw.get("layer_cache", None)
             if self._canva.backend != "surface":
                 layer_cache = None
-            pad = self._style_val(style, "image", "pad", 0)
-            padx = self._style_val(style, "image", "padx", pad)
-            pady = self._style_val(style, "image", "pady", pad)
             padx, pady = (
-                _coreutils._abs_perc(padx, rect.w),
-                _coreutils._abs_perc(pady, rect.h),
+                _coreutils._abs_perc(style.padx, rect.w),
+                _coreutils._abs_perc(style.pady, rect.h),
             )
-            do_fill = self._style_val(style, "image", "fill", False)
-            do_stretchx = self._style_val(style, "image", "stretchx", False)
-            do_stretchy = self._style_val(style, "image", "stretchy", False)
-            fill_color = self._style_val(style, "image", "fill_color", None)
-            smoothscale = self._style_val(style, "image", "smoothscale", True)
-            border_radius = self._style_val(style, "image", "border_radius", 0)
+            do_fill = style.fill
+            do_stretchx = style.stretchx
+            do_stretchy = style.stretchy
+            fill_color = style.fill_color
+            smoothscale = style.smoothscale
+            border_radius = style.border_radius
             border_radius = _coreutils._border_radius(border_radius, rect.w, rect.h)
-            alpha = self._style_val(style, "image", "alpha", 255)
+            alpha = style.alpha
             nine_patch = _coreutils._abs_perc(
-                self._style_val(style, "image", "ninepatch_size", 0),
+                style.ninepatch_size,
                 min(rect.w, rect.h),
             )
             nine_patch = pygame.math.clamp(nine_patch, 0, min(rect.w, rect.h) / 2)
-            transforms = self._style_val(style, "image", "transforms", None)
-            filters = self._style_val(style, "image", "filters", None)
+            transforms = style.transforms
+            filters = style.filters
             if nine_patch != 0 and (do_fill or do_stretchx or do_stretchy):
                 raise error.MILIIncompatibleStylesError(
                     "9-patch image mode is incompatible with fill, stretchx, and stretchy styles"
@@ -1328,7 +1801,7 @@ class _ctx:
                 )
 
             if not cache:
-                output = _coreutils._get_image(
+                output = self._shared_image(
                     rect,
                     data,
                     padx,
@@ -1343,7 +1816,7 @@ class _ctx:
                     nine_patch,
                     transforms,
                     filters,
-                    self._canva,
+                    shared,
                 )
                 if layer_cache:
                     layer_cache._dirty = True
@@ -1351,7 +1824,7 @@ class _ctx:
                 if cache._cache is None:
                     new_cache = {
                         "data": data,
-                        "style": style,
+                        "style": style.raw,
                         "pos": None,
                         "size": rect.size,
                     }
@@ -1389,11 +1862,11 @@ class _ctx:
                                 or nine_patch != 0
                             )
                         )
-                        or style != _cache["style"]
+                        or style.raw != _cache["style"]
                     ):
                         new_cache = {
                             "data": data,
-                            "style": style,
+                            "style": style.raw,
                             "pos": None,
                             "size": rect.size,
                         }
@@ -1454,59 +1927,292 @@ class _ctx:
         _coreutils._render_layer_cache(data, self._canva._surface)
         self._canva._set_clip(clip)
 
-    def _draw_update_element(
-        self, element: dict[str, typing.Any], parent_pos, parent_clip=None
+    def _draw_dirty(self) -> list[pygame.Rect]:
+        canva = self._canva
+        self._drawn_frame += 1
+        dirty = []
+        drawn = []
+        self._dirty_update_element(self._stack, (0, 0), None, dirty, drawn)
+        for element in self._drawn_elements:
+            if element.drawn_frame != self._drawn_frame and element.drawn is not None:
+                # not visible anymore, what was below it must be drawn again
+                dirty.append(element.drawn[0])
+                element.drawn = None
+        self._drawn_elements = drawn
+        if (
+            canva._dirty_full
+            or self._cleared > 0
+            or self._drawn_version != self._styles_version
+            or any(layer_cache.active for layer_cache in self._image_layer_caches)
+        ):
+            canva._dirty_full = False
+            self._drawn_version = self._styles_version
+            dirty = [canva._rect.copy()]
+        else:
+            dirty = _coreutils._merge_rects(dirty, canva._rect)
+        for rect in dirty:
+            canva._set_clip(rect)
+            if canva.clear_color is not None:
+                canva._draw_rect(canva.clear_color, rect)
+            self._draw_update_element(self._stack, (0, 0), None, False, rect)
+        return dirty
+
+    def _dirty_update_element(
+        self,
+        element: _Element,
+        parent_pos,
+        parent_clip,
+        dirty: list[pygame.Rect],
+        drawn: list[_Element],
     ):
-        el_style = element["style"]
-        offset = self._style_val(el_style, "element", "offset", (0, 0))
-        do_clip = self._style_val(el_style, "element", "clip_draw", True)
-        absolute_rect = element["rect"].move(
-            (parent_pos[0] + offset[0], parent_pos[1] + offset[1])
+        # same geometry and interaction checks as drawing, comparing what would be drawn
+        cstyle = element.cstyle
+        offset = cstyle.offset
+        absolute_rect = element.abs_rect
+        absolute_rect.update(element.rect)
+        absolute_rect.move_ip(parent_pos[0] + offset[0], parent_pos[1] + offset[1])
+        if absolute_rect.w <= 0 or absolute_rect.h <= 0:
+            return
+        if parent_clip is None:
+            parent_clip = absolute_rect
+        if not absolute_rect.colliderect(parent_clip):
+            return
+        visible = absolute_rect.clip(parent_clip)
+        if cstyle.clip_draw or cstyle.layer:
+            clip = area = visible
+        else:
+            clip = parent_clip
+            # the components can draw anywhere inside the parent
+            area = parent_clip.copy()
+        self._check_interaction(element)
+        components = []
+        # rich text reacts to the mouse while drawing
+        rich_hover = False
+        for component in element.components:
+            comp_type = component["type"]
+            components.append((comp_type, component["data"], component["style"]))
+            if comp_type == "text" and component["cstyle"].rich:
+                rich_hover = visible.collidepoint(self._mouse_pos)
+        key = (
+            area,
+            visible,
+            element.z,
+            element.hovered,
+            rich_hover,
+            cstyle,
+            components,
+            self._layer_key(element) if cstyle.layer else None,
+        )
+        old = element.drawn
+        if old is None:
+            dirty.append(area)
+        elif old != key or (rich_hover and self._input_changed):
+            dirty.append(old[0])
+            dirty.append(area)
+        element.drawn = key
+        element.drawn_frame = self._drawn_frame
+        drawn.append(element)
+        cd = element.cd
+        if cd is not None and len(cd.children) > 0:
+            for child in sorted(cd.children, key=lambda c: c.z):
+                if cstyle.layer:
+                    # the layer key already covers the children
+                    self._locate_element(child, absolute_rect.topleft, clip)
+                else:
+                    self._dirty_update_element(
+                        child, absolute_rect.topleft, clip, dirty, drawn
+                    )
+
+    def _locate_element(self, element: _Element, parent_pos, parent_clip, check=True):
+        # absolute rects and interactions of elements that are not drawn directly
+        cstyle = element.cstyle
+        offset = cstyle.offset
+        absolute_rect = element.abs_rect
+        absolute_rect.update(element.rect)
+        absolute_rect.move_ip(parent_pos[0] + offset[0], parent_pos[1] + offset[1])
+        if absolute_rect.w <= 0 or absolute_rect.h <= 0:
+            return
+        if not absolute_rect.colliderect(parent_clip):
+            return
+        if cstyle.clip_draw or cstyle.layer:
+            clip = absolute_rect.clip(parent_clip)
+        else:
+            clip = parent_clip
+        if check:
+            self._check_interaction(element)
+        cd = element.cd
+        if cd is not None and len(cd.children) > 0:
+            for child in sorted(cd.children, key=lambda c: c.z):
+                self._locate_element(child, absolute_rect.topleft, clip, check)
+
+    def _layer_key(self, element: _Element) -> list:
+        layer = element.layer
+        if layer is not None and layer.key_frame == self._frame:
+            return layer.key
+        style = {
+            name: value
+            for name, value in element.style.items()
+            if name != "offset" and name != "layer_alpha"
+        }
+        key = [self._styles_version, style]
+        rich_hover = self._layer_key_element(element, None, 0, 0, key)
+        if rich_hover and self._input_changed:
+            # rich text reacts to the mouse while drawing, the layer must be redrawn
+            key.append(self._frame)
+        if layer is None:
+            layer = element.layer = _Layer()
+        layer.key = key
+        layer.key_frame = self._frame
+        return key
+
+    def _layer_key_element(self, element: _Element, cstyle, x, y, key: list) -> bool:
+        rect = element.rect
+        components = []
+        rich_hover = False
+        for component in element.components:
+            comp_type = component["type"]
+            components.append((comp_type, component["data"], component["style"]))
+            if comp_type == "text" and component["cstyle"].rich:
+                rich_hover = element.abs_rect.collidepoint(self._mouse_pos)
+                cache = component["cstyle"].cache
+                if cache is not None and cache._rich is not None:
+                    # the conditional tags are toggled while drawing
+                    components.append(frozenset(cache._rich["active_tags"]))
+        key.append(
+            (
+                x,
+                y,
+                rect.w,
+                rect.h,
+                element.z,
+                element.hovered,
+                cstyle,
+                components,
+            )
         )
-        element["abs_rect"] = absolute_rect
+        cd = element.cd
+        if cd is not None:
+            for child in cd.children:
+                offset = child.cstyle.offset
+                if self._layer_key_element(
+                    child,
+                    child.cstyle,
+                    x + child.rect.x + offset[0],
+                    y + child.rect.y + offset[1],
+                    key,
+                ):
+                    rich_hover = True
+        return rich_hover
+
+    def _draw_layer(self, element: _Element, parent_clip, check, dirty=None):
+        canva = self._canva
+        absolute_rect = element.abs_rect
+        key = self._layer_key(element)
+        layer = element.layer
+        size = absolute_rect.size
+        target = canva._layer_target(layer.target, size)
+        if target is not layer.target or self._cleared > 0 or key != layer.drawn_key:
+            layer.target = target
+            layer.drawn_key = key
+            topleft = absolute_rect.topleft
+            rendering = self._layer_rendering
+            previous = canva._layer_begin(target)
+            self._layer_rendering = element
+            offset = element.cstyle.offset
+            # rich text is hovered where the layer is shown, in target coordinates
+            mouse_pos = self._mouse_pos
+            if absolute_rect.clip(parent_clip).collidepoint(mouse_pos):
+                self._mouse_pos = mouse_pos - topleft
+            else:
+                self._mouse_pos = pygame.Vector2(-1, -1)
+            # draw the element at the topleft of the target
+            self._draw_update_element(
+                element,
+                (-element.rect.x - offset[0], -element.rect.y - offset[1]),
+                None,
+                False,
+            )
+            self._mouse_pos = mouse_pos
+            self._layer_rendering = rendering
+            canva._layer_end(previous)
+            absolute_rect.topleft = topleft
+        canva._set_clip(parent_clip if dirty is None else parent_clip.clip(dirty))
+        canva._layer_blit(target, absolute_rect.topleft, element.cstyle.layer_alpha)
+        clip = absolute_rect.clip(parent_clip)
+        cd = element.cd
+        if cd is not None and len(cd.children) > 0:
+            for child in sorted(cd.children, key=lambda c: c.z):
+                self._locate_element(child, absolute_rect.topleft, clip, check)
+
+    def _draw_update_element(
+        self, element: _Element, parent_pos, parent_clip=None, check=True, dirty=None
+    ):
+        cstyle = element.cstyle
+        offset = cstyle.offset
+        absolute_rect = element.abs_rect
+        absolute_rect.update(element.rect)
+        absolute_rect.move_ip(parent_pos[0] + offset[0], parent_pos[1] + offset[1])
         if absolute_rect.w <= 0 or absolute_rect.h <= 0:
             return
         if parent_clip is None:
             parent_clip = absolute_rect
         if not absolute_rect.colliderect(parent_clip):
             return
-        if do_clip:
+        if cstyle.clip_draw:
             clip = absolute_rect.clip(parent_clip)
         else:
             clip = parent_clip
-        self._check_interaction(element)
-        self._canva._set_clip(clip)
+        draw_clip = clip
+        if dirty is not None:
+            # culled like a full draw so that children overflowing a parent that
+            # doesn't clip are still drawn, only the dirty area is painted
+            if not clip.colliderect(dirty):
+                return
+            draw_clip = clip.clip(dirty)
+        if check:
+            self._check_interaction(element)
+        if cstyle.layer:
+            if self._layer_rendering is not element:
+                self._draw_layer(element, parent_clip, check, dirty)
+                return
+        elif element.layer is not None:
+            element.layer = None
+        self._canva._set_clip(draw_clip)
         render_above = []
-        for component in element["components"]:
+        for component in element.components:
             comp_type = component["type"]
-            if self._style_val(component["style"], comp_type, "draw_above", False):
-                render_above.append(component)
-                continue
-            compobj = _globalctx._component_types[comp_type]
-            if isinstance(compobj, str):
-                getattr(self, f"_draw_comp_{comp_type}")(
-                    component["data"], component["style"], element, absolute_rect
+            comp_cstyle = component["cstyle"]
+            if comp_cstyle is None:
+                if self._style_val(component["style"], comp_type, "draw_above", False):
+                    render_above.append(component)
+                    continue
+                _globalctx._component_types[comp_type].draw(
+                    self, component["data"], component["style"], element, absolute_rect
                 )
             else:
-                compobj.draw(
-                    self, component["data"], component["style"], element, absolute_rect
+                if comp_cstyle.draw_above:
+                    render_above.append(component)
+                    continue
+                getattr(self, f"_draw_comp_{comp_type}")(
+                    component["data"], comp_cstyle, element, absolute_rect
+                )
+        cd = element.cd
+        if cd is not None and len(cd.children) > 0:
+            for child in sorted(cd.children, key=lambda c: c.z):
+                self._draw_update_element(
+                    child, absolute_rect.topleft, clip, check, dirty
                 )
-        cd = element["cd"]
-        if len(cd.get("children", ())) > 0:
-            for child in sorted(cd["children"], key=lambda c: c["z"]):
-                self._canva._set_clip(clip)
-                self._draw_update_element(child, absolute_rect.topleft, clip)
-                self._canva._set_clip(clip)
+            self._canva._set_clip(draw_clip)
         for component in render_above:
             comp_type = component["type"]
-            compobj = _globalctx._component_types[comp_type]
-            if isinstance(compobj, str):
-                getattr(self, f"_draw_comp_{comp_type}")(
-                    component["data"], component["style"], element, absolute_rect
+            comp_cstyle = component["cstyle"]
+            if comp_cstyle is None:
+                _globalctx._component_types[comp_type].draw(
+                    self, component["data"], component["style"], element, absolute_rect
                 )
             else:
-                compobj.draw(
-                    self, component["data"], component["style"], element, absolute_rect
+                getattr(self, f"_draw_comp_{comp_type}")(
+                    component["data"], comp_cstyle, element, absolute_rect
                 )
 
     def _start_check(self):
@@ -1,22 +1,22 @@
 import pygame
 import typing
 import math
+from collections import OrderedDict
 from mili import error
 from mili import data as _data
 
 if typing.TYPE_CHECKING:
-    from mili._core import _ctx
+    from mili._core import _ctx, _Element
     from mili import canva as _canva
+    from pygame._sdl2 import video as pgvideo
 
 __all__ = ()
 
 _VALID_ALIGN = set(["first", "last", "center"])
 _VALID_ANCHOR = set(["first", "last", "center", "max_spacing"])
 _VALID_ALIGN_GRID = set(["first", "last", "center", "first_center", "last_center"])
+_MAX_DIRTY_RECTS = 32
 _OUTLINE_OFFSETS = [(0, 0), (2, 0), (0, 2), (2, 2), (1, 0), (1, 2), (0, 1), (2, 1)]
-_OUTLINE_OFFSETS_CENTERED = [
-    (offset[0] - 1, offset[1] - 1) for offset in _OUTLINE_OFFSETS
-]
 _FONT_ALIGNS = {
     "left": pygame.FONT_LEFT,
     "center": pygame.FONT_CENTER,
@@ -36,6 +36,177 @@ _FONT_DIRS = {
     pygame.DIRECTION_BTT: pygame.DIRECTION_BTT,
 }
 _number_mods = {}
+# (name, defaults major, fallback value, fallback field) per compiled style type
+_STYLE_FIELDS = {
+    "element": (
+        ("cache", "element", None, None),
+        ("cache_rect_size", "element", False, None),
+        ("size_clamp", "element", None, None),
+        ("ignore_grid", "element", False, None),
+        ("fillx", "element", False, None),
+        ("filly", "element", False, None),
+        ("resizex", "element", False, None),
+        ("resizey", "element", False, None),
+        ("axis", "element", "y", None),
+        ("pad", "element", 5, None),
+        ("padx", "element", None, "pad"),
+        ("pady", "element", None, "pad"),
+        ("spacing", "element", 3, None),
+        ("anchor", "element", "first", None),
+        ("default_align", "element", "first", None),
+        ("layout", "element", "stack", None),
+        ("grid", "element", False, None),
+        ("grid_align", "element", "first", None),
+        ("blocking", "element", True, None),
+        ("clip_draw", "element", True, None),
+        ("offset", "element", (0, 0), None),
+        ("update_id", "element", None, None),
+        ("layer", "element", False, None),
+        ("layer_alpha", "element", 255, None),
+    ),
+    "rect": (
+        ("color", "rect", "black", None),
+        ("ready_rect", "rect", None, None),
+        ("pad", "rect", 0, None),
+        ("padx", "rect", None, "pad"),
+        ("pady", "rect", None, "pad"),
+        ("outline", "rect", 0, None),
+        ("border_radius", "rect", 7, None),
+        ("aspect_ratio", "rect", None, None),
+        ("align", "rect", "center", None),
+        ("dash_size", "line", None, None),
+        ("dash_offset", "line", 0, None),
+        ("draw_above", "rect", False, None),
+    ),
+    "circle": (
+        ("color", "circle", "black", None),
+        ("pad", "circle", 0, None),
+        ("padx", "circle", None, "pad"),
+        ("pady", "circle", None, "pad"),
+        ("outline", "circle", 0, None),
+        ("antialias", "circle", False, None),
+        ("aspect_ratio", "circle", None, None),
+        ("corners", "circle", None, None),
+        ("align", "circle", "center", None),
+        ("dash_size", "line", None, None),
+        ("dash_anchor", "line", 25, None),
+        ("draw_above", "circle", False, None),
+    ),
+    "polygon": (
+        ("color", "polygon", "black", None),
+        ("pad", "line", 0, None),
+        ("padx", "line", None, "pad"),
+        ("pady", "line", None, "pad"),
+        ("outline", "polygon", 0, None),
+        ("draw_above", "polygon", False, None),
+    ),
+    "line": (
+        ("color", "line", "black", None),
+        ("pad", "line", 0, None),
+        ("padx", "line", None, "pad"),
+        ("pady", "line", None, "pad"),
+        ("size", "line", 1, None),
+        ("antialias", "line", False, None),
+        ("dash_size", "line", None, None),
+        ("dash_offset", "line", 0, None),
+        ("draw_above", "line", False, None),
+    ),
+    "text": (
+        ("name", "text", None, None),
+        ("size", "text", 20, None),
+        ("sysfont", "text", False, None),
+        ("blit_flags", "text", 0, None),
+        ("align", "text", "center", None),
+        ("padx", "text", 5, None),
+        ("pady", "text", 3, None),
+        ("pad", "text", None, None),
+        ("rich", "text", False, None),
+        ("cache", "text", None, None),
+        ("rich_actions", "text", {}, None),
+        ("font_align", "text", pygame.FONT_CENTER, None),
+        ("font_direction", "text", pygame.DIRECTION_LTR, None),
+        ("bold", "text", False, None),
+        ("italic", "text", False, None),
+        ("underline", "text", False, None),
+        ("strikethrough", "text", False, None),
+        ("antialias", "text", True, None),
+        ("color", "text", "white", None),
+        ("bg_color", "text", None, None),
+        ("outline_color", "text", None, None),
+        ("growx", "text", False, None),
+        ("growy", "text", True, None),
+        ("wraplen", "text", 0, None),
+        ("slow_grow", "text", False, None),
+        ("glyph_atlas", "text", False, None),
+        ("draw_above", "text", False, None),
+    ),
+    "image": (
+        ("cache", "image", None, None),
+        ("ready", "image", False, None),
+        ("blit_flags", "image", 0, None),
+        ("pad", "image", 0, None),
+        ("padx", "image", None, "pad"),
+        ("pady", "image", None, "pad"),
+        ("fill", "image", False, None),
+        ("stretchx", "image", False, None),
+        ("stretchy", "image", False, None),
+        ("fill_color", "image", None, None),
+        ("smoothscale", "image", True, None),
+        ("border_radius", "image", 0, None),
+        ("alpha", "image", 255, None),
+        ("ninepatch_size", "image", 0, None),
+        ("transforms", "image", None, None),
+        ("filters", "image", None, None),
+        ("draw_above", "image", False, None),
+    ),
+    "image_layer": (("draw_above", "image_layer", False, None),),
+}
+
+
+class _SharedCache:
+    __slots__ = ("entries", "bytes", "budget", "hits", "misses", "evictions")
+
+    # least recently used surfaces or textures limited by their size in bytes
+    def __init__(self, budget: int):
+        self.entries: OrderedDict[tuple, tuple[typing.Any, int]] = OrderedDict()
+        self.bytes = 0
+        self.budget = budget
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, output: "pygame.Surface | pgvideo.Texture", extra: int = 0):
+        # extra counts what the key keeps alive, like the source image
+        size = output.width * output.height * 4 + extra
+        if size > self.budget:
+            # storing it would only flush the other entries
+            return
+        self.entries[key] = (output, size)
+        self.bytes += size
+        while self.bytes > self.budget and self.entries:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+        }
 
 
 def _render_layer_cache(self: _data.ImageLayerCache, canva: pygame.Surface | None):
@@ -68,6 +239,22 @@ def _render_layer_cache(self: _data.ImageLayerCache, canva: pygame.Surface | Non
     self._rendered = True
 
 
+def _merge_rects(rects: list[pygame.Rect], bounds: pygame.Rect) -> list[pygame.Rect]:
+    merged = []
+    for rect in rects:
+        rect = rect.clip(bounds)
+        if rect.w <= 0 or rect.h <= 0:
+            continue
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    if len(merged) > _MAX_DIRTY_RECTS:
+        return [merged[0].unionall(merged[1:])]
+    return merged
+
+
 def _abs_perc(val, dim) -> float:
     if isinstance(val, str):
         val = val.strip()
@@ -170,6 +357,18 @@ def _nine_patch(image: pygame.Surface, w, h, s, smoothscale):
     return base
 
 
+def _color_key(color):
+    if isinstance(color, (pygame.Color, list)):
+        return tuple(color)
+    return color
+
+
+def _callables_key(callables):
+    if callables is None:
+        return None
+    return tuple(item if callable(item) else tuple(item) for item in callables)
+
+
 def _render_text(
     data,
     font: pygame.Font,
@@ -200,11 +399,26 @@ def _render_text(
     outline = font.render(
         str(data), antialias, outline_color, bg_color, max(0, int(wraplen))
     )
-    output = pygame.Surface((middle.width + 2, middle.height + 2), pygame.SRCALPHA)
-    for offset in _OUTLINE_OFFSETS:
+    return canva._get_image(_outline_surface(middle, outline))
+
+
+def _outline_surface(middle: pygame.Surface, outline: pygame.Surface, size=1):
+    output = pygame.Surface(
+        (middle.width + size * 2, middle.height + size * 2), pygame.SRCALPHA
+    )
+    if size == 1:
+        offsets = _OUTLINE_OFFSETS
+    else:
+        offsets = [
+            (x, y)
+            for x in range(size * 2 + 1)
+            for y in range(size * 2 + 1)
+            if (x, y) != (size, size)
+        ]
+    for offset in offsets:
         output.blit(outline, offset)
-    output.blit(middle, (1, 1))
-    return canva._get_image(output)
+    output.blit(middle, (size, size))
+    return output
 
 
 def _get_image_rect(rect: pygame.Rect, padx, pady, do_stretchx, do_stretchy, data):
@@ -330,29 +544,17 @@ def _get_image(
     return image if canva is None else canva._get_image(image, old_source)
 
 
-def _element_data(ctx: "_ctx", el: dict[str, typing.Any]) -> "_data.ElementData":
-    if el["id"] in ctx._old_data:
-        old_data = ctx._old_data[el["id"]]
-    else:
-        old_data = {
-            "rect": pygame.Rect(),
-            "abs_rect": pygame.Rect(),
-            "children": [],
-            "components": [],
-            "parent_id": 0,
-            "grid": None,
-        }
-    grid = old_data["grid"]
+def _element_data(ctx: "_ctx", el: "_Element") -> "_data.ElementData":
     return _data.ElementData(
-        rect=old_data["rect"].copy(),
-        absolute_rect=old_data["abs_rect"].copy(),
-        z=el["z"],
-        id=el["id"],
-        style=el["style"],
-        _children=old_data["children"],
-        parent_id=old_data["parent_id"],
-        components=old_data["components"],
-        _grid=grid,
+        rect=el.old_rect.copy(),
+        absolute_rect=el.old_abs_rect.copy(),
+        z=el.z,
+        id=el.id,
+        style=el.style,
+        _children=el.old_children,
+        parent_id=el.old_parent_id,
+        components=el.old_components,
+        _grid=el.old_grid,
     )
 
 
@@ -416,8 +618,8 @@ def _check_align_grid(align):
 
 
 def _partial_interaction(ctx, element, absolute_hover):
-    element["hovered"] = False
-    if (eid := element["id"]) in ctx._interaction_cache:
+    element.hovered = False
+    if (eid := element.id) in ctx._interaction_cache:
         i = ctx._interaction_cache[eid]
         (
             i.hovered,
@@ -447,8 +649,8 @@ def _partial_interaction(ctx, element, absolute_hover):
     return i
 
 
-def _total_interaction(ctx, element, absolute_hover, hovered, unhovered, old_el):
-    if (eid := element["id"]) in ctx._interaction_cache:
+def _total_interaction(ctx, element, absolute_hover, hovered, unhovered):
+    if (eid := element.id) in ctx._interaction_cache:
         i = ctx._interaction_cache[eid]
         (
             i.hovered,
@@ -462,33 +664,33 @@ def _total_interaction(ctx, element, absolute_hover, hovered, unhovered, old_el)
             i._data,
         ) = (
             absolute_hover and hovered,
-            _get_first_button(pygame.mouse.get_pressed(5, ctx._global_mouse)),
-            _get_first_button(ctx._get_just_pressed_func()),
-            _get_first_button(ctx._get_just_released_func()) if absolute_hover else -1,
+            ctx._pressed_button,
+            ctx._just_pressed_button,
+            ctx._just_released_button if absolute_hover else -1,
             absolute_hover,
             unhovered,
             0,
-            old_el,
+            element,
             None,
         )
     else:
         i = _data.Interaction(
             ctx._mili,
             absolute_hover and hovered,
-            _get_first_button(pygame.mouse.get_pressed(5, ctx._global_mouse)),
-            _get_first_button(ctx._get_just_pressed_func()),
-            _get_first_button(ctx._get_just_released_func()) if absolute_hover else -1,
+            ctx._pressed_button,
+            ctx._just_pressed_button,
+            ctx._just_released_button if absolute_hover else -1,
             absolute_hover,
             unhovered,
             0,
-            old_el,
+            element,
         )
         ctx._interaction_cache[eid] = i
-    if i.hovered and not old_el["hovered"]:
+    if i.hovered and not element.hovered:
         i._just_hover = 1
-    if not i.hovered and old_el["hovered"]:
+    if not i.hovered and element.hovered:
         i._just_hover = -1
-    element["hovered"] = i.hovered
+    element.hovered = i.hovered
     return i
 
 
@@ -0,0 +1,253 @@
+import pygame
+import typing
+import itertools
+from collections import OrderedDict
+from mili import _coreutils
+
+if typing.TYPE_CHECKING:
+    from mili.canva import _AbstractCanva
+
+__all__ = ()
+
+_SHEET_WIDTH = 256
+_MAX_ATLASES = 32
+_MAX_TINTS = 8
+_WHITE = (255, 255, 255, 255)
+_atlases: OrderedDict[tuple, "_GlyphAtlas"] = OrderedDict()
+_metrics: dict[tuple, tuple[dict[str, int], dict[str, int]]] = {}
+_layouts: dict[tuple, tuple] = {}
+_MAX_LAYOUTS = 1024
+
+
+class _GlyphAtlas:
+    __slots__ = (
+        "font",
+        "style",
+        "antialias",
+        "sheet",
+        "areas",
+        "x",
+        "y",
+        "row_h",
+        "version",
+        "image",
+        "image_version",
+        "tints",
+    )
+
+    # the glyphs are rendered in white and tinted with the text color when drawn
+    def __init__(self, font: pygame.Font, style, antialias):
+        self.font = font
+        self.style = style
+        self.antialias = antialias
+        self.sheet = pygame.Surface((_SHEET_WIDTH, font.get_height()), pygame.SRCALPHA)
+        self.areas: dict[str, pygame.Rect] = {}
+        self.x = self.y = self.row_h = 0
+        self.version = 0
+        self.image = None
+        self.image_version = -1
+        self.tints: OrderedDict[tuple, tuple[int, pygame.Surface]] = OrderedDict()
+
+    def area(self, char: str) -> pygame.Rect:
+        area = self.areas.get(char, None)
+        if area is not None:
+            return area
+        _set_font_style(self.font, self.style)
+        surf = self.font.render(char, self.antialias, _WHITE)
+        w, h = surf.size
+        if self.x + w > self.sheet.width:
+            self.x = 0
+            self.y += self.row_h
+            self.row_h = 0
+        if self.y + h > self.sheet.height or w > self.sheet.width:
+            sheet = pygame.Surface(
+                (max(self.sheet.width, w), max(self.sheet.height * 2, self.y + h)),
+                pygame.SRCALPHA,
+            )
+            sheet.blit(self.sheet, (0, 0))
+            self.sheet = sheet
+        area = self.areas[char] = pygame.Rect(self.x, self.y, w, h)
+        self.sheet.blit(surf, area)
+        self.x += w
+        self.row_h = max(self.row_h, h)
+        self.version += 1
+        return area
+
+    def get_image(self, canva: "_AbstractCanva", color):
+        # like Font.render, the alpha of the color is ignored
+        color = pygame.Color(color)
+        color.a = 255
+        if canva.backend == "surface":
+            return self.get_tint(tuple(color))
+        if (
+            self.image is None
+            or self.image_version != self.version
+            or self.image.renderer is not canva._renderer
+        ):
+            self.image = canva._get_image(self.sheet, self.image)
+            self.image_version = self.version
+        # assigning the Color object itself crashes pygame-ce 2.5 at exit
+        self.image.color = tuple(color)
+        return self.image
+
+    def get_tint(self, color: tuple) -> pygame.Surface:
+        if color == _WHITE:
+            return self.sheet
+        tint = self.tints.get(color, None)
+        if tint is not None and tint[0] == self.version:
+            self.tints.move_to_end(color)
+            return tint[1]
+        surf = self.sheet.copy()
+        surf.fill(color, special_flags=pygame.BLEND_RGBA_MULT)
+        self.tints[color] = (self.version, surf)
+        self.tints.move_to_end(color)
+        if len(self.tints) > _MAX_TINTS:
+            self.tints.popitem(last=False)
+        return surf
+
+    def blits(self, placements, x, y):
+        area = self.area
+        return [((x + gx, y + gy), area(char)) for gx, gy, char in placements]
+
+
+def _set_font_style(font: pygame.Font, style):
+    font.bold, font.italic, font.underline, font.strikethrough = style
+    font.set_direction(pygame.DIRECTION_LTR)
+
+
+def _get_atlas(font, style, antialias) -> _GlyphAtlas:
+    key = (font, style, antialias)
+    atlas = _atlases.get(key, None)
+    if atlas is not None:
+        _atlases.move_to_end(key)
+        return atlas
+    atlas = _atlases[key] = _GlyphAtlas(font, style, antialias)
+    if len(_atlases) > _MAX_ATLASES:
+        _atlases.popitem(last=False)
+    return atlas
+
+
+def _clear():
+    _atlases.clear()
+    _metrics.clear()
+    _layouts.clear()
+
+
+def _get_metrics(font: pygame.Font, style):
+    # advances and heights of single glyphs, filled by _add_metrics
+    metrics = _metrics.get((font, style), None)
+    if metrics is None:
+        metrics = _metrics[(font, style)] = ({}, {})
+    return metrics
+
+
+def _add_metrics(font: pygame.Font, style, chars):
+    advances, heights = _get_metrics(font, style)
+    _set_font_style(font, style)
+    for char in chars:
+        # the size of a single italic glyph includes the slant
+        w, heights[char] = font.size(char)
+        metric = font.metrics(char)[0]
+        advances[char] = w if metric is None else metric[4]
+
+
+def _layout(font: pygame.Font, style, text: str, fontalign):
+    # the glyphs position relative to the text topleft, using cached advances
+    key = (font, style, text, fontalign)
+    layout = _layouts.get(key, None)
+    if layout is not None:
+        return layout
+    advances, heights = _get_metrics(font, style)
+    missing = set(text).difference(advances)
+    if missing:
+        _add_metrics(font, style, missing)
+    lines = []
+    width = 0
+    for line in text.split("\n"):
+        xs = list(itertools.accumulate(map(advances.__getitem__, line), initial=0))
+        width = max(width, xs[-1])
+        lines.append((line, xs))
+    linesize = font.get_linesize()
+    if len(lines) > 1:
+        height = linesize * len(lines)
+    else:
+        height = max(map(heights.__getitem__, text), default=0)
+        height = max(height, font.get_height())
+    # underline and strikethrough are drawn on spaces too
+    skip_spaces = not style[2] and not style[3]
+    placements = []
+    for i, (line, xs) in enumerate(lines):
+        offset = 0
+        if fontalign == pygame.FONT_CENTER:
+            offset = (width - xs[-1]) // 2
+        elif fontalign == pygame.FONT_RIGHT:
+            offset = width - xs[-1]
+        y = i * linesize
+        placements.extend(
+            [
+                (x + offset, y, char)
+                for x, char in zip(xs, line)
+                if not skip_spaces or not char.isspace()
+            ]
+        )
+    if len(_layouts) >= _MAX_LAYOUTS:
+        _layouts.clear()
+    layout = _layouts[key] = ((width, height), placements)
+    return layout
+
+
+def _supported(wraplen, fontdir):
+    return wraplen <= 0 and fontdir == pygame.DIRECTION_LTR
+
+
+def _text_size(data, font, fontalign, style, outline_color):
+    (w, h), _ = _layout(font, style, str(data), fontalign)
+    if outline_color is not None:
+        return w + 2, h + 2
+    return w, h
+
+
+def _draw_text(
+    canva: "_AbstractCanva",
+    data,
+    font,
+    fontalign,
+    style,
+    antialias,
+    color,
+    bg_color,
+    outline_color,
+    align,
+    rect: pygame.Rect,
+    padx,
+    pady,
+    growx,
+    growy,
+    blit_flags,
+):
+    (w, h), placements = _layout(font, style, str(data), fontalign)
+    if outline_color is not None:
+        w, h = w + 2, h + 2
+    if growy and h > rect.h + pady * 2:
+        rect.h = h + pady * 2
+    if growx and w > rect.w + padx * 2:
+        rect.w = w + padx * 2
+    txtrect = pygame.Rect(0, 0, w, h).move_to(
+        **_coreutils._align_rect(align, rect, padx, pady)
+    )
+    if bg_color is not None:
+        canva._draw_rect(bg_color, txtrect)
+    x, y = txtrect.topleft
+    atlas = _get_atlas(font, style, antialias)
+    if outline_color is not None:
+        blits = atlas.blits(placements, x, y)
+        image = atlas.get_image(canva, outline_color)
+        for ox, oy in _coreutils._OUTLINE_OFFSETS:
+            canva._blit_areas(
+                image,
+                [((bx + ox, by + oy), area) for (bx, by), area in blits],
+                blit_flags,
+            )
+        x, y = x + 1, y + 1
+    blits = atlas.blits(placements, x, y)
+    canva._blit_areas(atlas.get_image(canva, color), blits, blit_flags)
@@ -1,15 +1,23 @@
 import os
 import io
 import urllib.request
-import urllib.error
 import threading
+import queue
 import pygame
+import re
+import html
 import typing
-import html.parser
+import bisect
+import operator
+import itertools
+import copy
+import json
+import hashlib
 from mili import _coreutils
+from mili import _glyphs
 from mili import icon as mili_icon
 from mili.data import TextCache, ImageCache
-from pygame._sdl2 import video as pgvideo
+from collections import OrderedDict
 
 if typing.TYPE_CHECKING:
     from mili.mili import MILI, MarkDown
@@ -18,26 +26,65 @@ if typing.TYPE_CHECKING:
 
 
 def _markdown_ui(mili: "MILI", markdown: "MarkDown"):
-    if markdown._parse_result is None:
+    result = markdown._parse_result
+    if result is None:
         return
     parent = mili._ctx._parent
-    pad = mili._ctx._style_val(parent["style"], "element", "pad", 0)
+    pad = mili._ctx._style_val(parent.style, "element", "pad", 0)
     padx = _coreutils._abs_perc(
-        mili._ctx._style_val(parent["style"], "element", "padx", pad), parent["rect"].w
+        mili._ctx._style_val(parent.style, "element", "padx", pad), parent.rect.w
     )
     actions = {
         "link_hover": markdown._link_hover,
         "link_click": markdown._link_click,
     }
-    parent_w = parent["rect"].w - padx * 2
+    parent_w = parent.rect.w - padx * 2
     state = {
         "bottom": 0,
         "skiph": False,
         "h": markdown._heights,
         "actions": actions,
-        "images": markdown._images,
+        "virtual": False,
     }
-    for element in markdown._parse_result:
+    ctx = mili._ctx
+    if not _md_can_skip(ctx, parent):
+        for element in result:
+            _md_ui_element(
+                mili,
+                element,
+                markdown.style,
+                parent_w,
+                False,
+                state,
+            )
+        return
+    window = _md_measure(ctx, markdown, result, parent)
+    _, tops, ids = _md_index(markdown, result)
+    spacing = _coreutils._abs_perc(parent.cstyle.spacing, parent.old_rect.h)
+    first, last = 0, len(result)
+    if window is not None:
+        # the elements outside of the window are skipped instead of replaced one by one
+        state["virtual"] = True
+        view, origin = window
+        # elements one viewport above and below are kept to follow the scroll
+        first = max(bisect.bisect_right(tops, view.y - view.h - origin) - 1, 0)
+        last = max(
+            min(bisect.bisect_left(tops, view.bottom + view.h - origin), last), first
+        )
+    # the spacers have reserved IDs so that every element keeps its ID
+    start_id = ctx._id
+    anchor = None
+    if first > 0:
+        mili.element((0, 0, 0, tops[first] - spacing), {"blocking": False})
+        anchor = ctx._element
+    else:
+        mili.element((0, 0, 0, 0), {"ignore_grid": True, "blocking": False})
+    ctx._id = start_id + 2 + ids[first]
+    grid = parent.cd.children_grid
+    emitted = []
+    for element in result[first:last]:
+        grid_start = len(grid)
+        id_before = ctx._id
         _md_ui_element(
             mili,
             element,
@@ -46,6 +93,86 @@ def _markdown_ui(mili: "MILI", markdown: "MarkDown"):
             False,
             state,
         )
+        items = grid[grid_start:]
+        if items:
+            emitted.append((element, items[0], items[-1], ctx._id - id_before))
+    if anchor is None and emitted:
+        anchor = emitted[0][1]
+    end_id = ctx._id
+    ctx._id = start_id + 1
+    if last < len(result):
+        mili.element((0, 0, 0, tops[-1] - tops[last] - spacing), {"blocking": False})
+    else:
+        mili.element((0, 0, 0, 0), {"ignore_grid": True, "blocking": False})
+    ctx._id = max(end_id, start_id + 2 + ids[-1])
+    # replaced elements don't have their real size
+    if not state["virtual"]:
+        emitted = None
+    markdown._window = (result, anchor, emitted, spacing)
+
+
+def _md_can_skip(ctx, parent):
+    cstyle = parent.cstyle
+    return not (
+        ctx._canva._rect is None
+        or cstyle.axis != "y"
+        or cstyle.layout != "stack"
+        or cstyle.grid
+        or cstyle.anchor == "max_spacing"
+    )
+
+
+def _md_measure(ctx, markdown: "MarkDown", result, parent):
+    # measures the elements emitted last frame now that they are laid out, returns the
+    # visible area and where the document starts or None if they can't be trusted
+    window = markdown._window
+    if window is None:
+        return None
+    last_result, anchor, emitted, spacing = window
+    # when the IDs shifted the elements might belong to others already
+    if anchor is None or anchor.id < ctx._id or anchor.parent is not parent:
+        return None
+    if emitted is not None and last_result is result:
+        extents = markdown._extents
+        changed = False
+        for i, (element, first, last, ids) in enumerate(emitted):
+            if i + 1 < len(emitted):
+                advance = emitted[i + 1][1].rect.y - first.rect.y
+            else:
+                advance = last.rect.bottom - first.rect.y + spacing
+            extent = (advance, ids)
+            if extents.get(id(element), None) != extent:
+                extents[id(element)] = extent
+                changed = True
+        if changed:
+            markdown._index = None
+    view = pygame.Rect((0, 0), ctx._canva._rect.size)
+    if parent.cstyle.clip_draw:
+        view = view.clip(parent.old_abs_rect)
+    return view, anchor.abs_rect.y
+
+
+def _md_index(markdown: "MarkDown", result):
+    # prefix sums of the elements advances and IDs, unmeasured ones are estimated
+    index = markdown._index
+    if index is not None and index[0] is result and len(index[1]) == len(result) + 1:
+        return index
+    extents = markdown._extents
+    known = [extents.get(id(element), None) for element in result]
+    advances = [extent[0] for extent in known if extent is not None]
+    estimate = sum(advances) / len(advances) if advances else _MD_ESTIMATED_ADVANCE
+    tops = list(
+        itertools.accumulate(
+            [estimate if extent is None else extent[0] for extent in known], initial=0
+        )
+    )
+    ids = list(
+        itertools.accumulate(
+            [1 if extent is None else extent[1] for extent in known], initial=0
+        )
+    )
+    index = markdown._index = (result, tops, ids)
+    return index
 
 
 def _md_ui_element(
@@ -228,22 +355,66 @@ def _md_ui_table(
     _md_update_state(it, mili, state)
 
 
-def _md_image_link_async(url, storage):
+def _md_image_fetch(url, cache_dir):
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha256(url.encode("utf-8", "surrogatepass")).hexdigest()
+        path = os.path.join(cache_dir, "images", key)
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except OSError:
+            pass
+    with urllib.request.urlopen(url) as response:
+        image_data = response.read()
+    if path is not None:
+        _md_cache_write(path, image_data)
+    return image_data
+
+
+def _md_image_load(url, cache_dir):
     try:
-        with urllib.request.urlopen(url) as response:
-            image_data = response.read()
-            image = pygame.image.load(io.BytesIO(image_data)).convert_alpha()
-            storage[url] = image
-    except (urllib.error.HTTPError, urllib.error.URLError, pygame.error):
-        storage[url] = None
+        if url.startswith("https"):
+            image = pygame.image.load(io.BytesIO(_md_image_fetch(url, cache_dir)))
+        else:
+            image = pygame.image.load(url)
+        return image.convert_alpha()
+    except (OSError, ValueError, pygame.error):
+        return None
 
 
-def _md_image_disk_async(path, storage):
-    try:
-        image = pygame.image.load(path).convert_alpha()
-        storage[path] = image
-    except (urllib.error.HTTPError, urllib.error.URLError, pygame.error):
-        storage[path] = None
+def _md_image_worker():
+    while True:
+        url, cache_dir = _md_image_queue.get()
+        image = None
+        try:
+            image = _md_image_load(url, cache_dir)
+        except Exception:
+            # any error only loses this image, the worker and the url are released
+            pass
+        finally:
+            _md_images_loaded.append((url, image))
+
+
+def _md_image_request(url, cache_dir):
+    # each url is queued once, the queue is shared by a few daemon threads
+    _md_image_pending.add(url)
+    _md_image_queue.put((url, cache_dir))
+    _md_image_workers[:] = [thread for thread in _md_image_workers if thread.is_alive()]
+    if len(_md_image_workers) < min(_MD_IMAGE_WORKERS, len(_md_image_pending)):
+        thread = threading.Thread(target=_md_image_worker)
+        thread.daemon = True
+        thread.start()
+        _md_image_workers.append(thread)
+
+
+def _md_image_store(url, image: pygame.Surface | None):
+    _md_image_pending.discard(url)
+    # an image that doesn't fit the budget would be loaded again every frame
+    if image is None or image.width * image.height * 4 > _md_image_cache.budget:
+        _md_image_failed.add(url)
+    elif url not in _md_image_cache.entries:
+        _md_image_cache.put(url, image)
 
 
 def _md_ui_image(
@@ -257,42 +428,22 @@ def _md_ui_image(
     url = element.content["url"]
     click = element.content["click_url"]
     surface = None
-    use_alt = False
-    images = state["images"]
-    if url in images:
-        surface = images[url]
+    if url not in _md_image_pending and url not in _md_image_failed:
+        # images that were evicted while off screen are loaded again
+        surface = _md_image_cache.get(url)
         if surface is None:
-            use_alt = True
-    else:
-        use_alt = True
-        images[url] = None
-        if url.startswith("https"):
-            if style["allow_image_link"]:
-                if style["load_images_async"]:
-                    thread = threading.Thread(
-                        target=_md_image_link_async, args=(url, images)
-                    )
-                    thread.daemon = True
-                    thread.start()
-                else:
-                    _md_image_link_async(url, images)
-                    surface = images[url]
-                    if surface is not None:
-                        use_alt = False
-        else:
-            if os.path.exists(url):
-                if style["load_images_async"]:
-                    thread = threading.Thread(
-                        target=_md_image_disk_async, args=(url, images)
-                    )
-                    thread.daemon = True
-                    thread.start()
-                else:
-                    _md_image_disk_async(url, images)
-                    surface = images[url]
-                    if surface is not None:
-                        use_alt = False
-    if use_alt or surface is None:
+            if url.startswith("https"):
+                allowed = style["allow_image_link"]
+            else:
+                allowed = os.path.exists(url)
+                if not allowed:
+                    _md_image_failed.add(url)
+            if allowed and style["load_images_async"]:
+                _md_image_request(url, style["cache_dir"])
+            elif allowed:
+                _md_image_store(url, _md_image_load(url, style["cache_dir"]))
+                surface = _md_image_cache.get(url)
+    if surface is None:
         _md_ui_paragraph(
             mili,
             element.alt_element,
@@ -313,7 +464,7 @@ def _md_ui_image(
                 real_w = real_h * oratio
         it = mili.image_element(
             surface,
-            {"cache": element.image_cache},
+            {"cache": "auto"},
             (0, 0, real_w, real_h),
             {"blocking": click is not None},
         )
@@ -651,7 +802,7 @@ def _md_ui_line_break(mili, style, state):
 
 
 def _md_update_state(it, mili, state):
-    if not state["skiph"]:
+    if not state["skiph"] and not state["virtual"]:
         state["bottom"] = it.data.absolute_rect.bottom
         if state["bottom"] > mili._ctx._canva._rect.h * 2:
             state["skiph"] = True
@@ -659,27 +810,152 @@ def _md_update_state(it, mili, state):
 
 ScrollClass = None
 ScrollbarClass = None
-
-
-def _markdown_parse(source: str, markdown: "MarkDown"):
-    global ScrollClass, ScrollbarClass
+_MD_ESTIMATED_ADVANCE = 20
+_md_parsed: list[tuple["MarkDown", int, tuple]] = []
+# bump when the parser output changes so that old cache files are ignored
+_MD_PARSER_VERSION = 1
+_MD_IMAGE_WORKERS = 4
+# decoded images shared by all the markdowns, evicted ones are loaded again
+_md_image_cache = _coreutils._SharedCache(64 * 1024 * 1024)
+_md_image_queue: queue.SimpleQueue[tuple[str, str | None]] = queue.SimpleQueue()
+_md_image_workers: list[threading.Thread] = []
+_md_image_pending: set[str] = set()
+_md_image_failed: set[str] = set()
+_md_images_loaded: list[tuple[str, pygame.Surface | None]] = []
+
+
+def _markdown_parse(source: str, style: "MarkDownStyleLike", checkpoint=None):
+    # doesn't touch the MarkDown so that it can run in a thread, the elements
+    # of the checkpoint are reused but never modified
     if not source:
-        return None
+        return None, None, None
     # source = source.replace("<br>", "\n\n").replace("<hr>", "\n---\n")
-    style = markdown.style["code_scrollbar_style"]
+    cache_dir = style["cache_dir"]
+    style = style["code_scrollbar_style"]
     if style is None:
         style = {}
-    parser = _MarkDownParser(
-        source,
-        {
-            "axis": "x",
-            "short_size": style["height"],
-            "padding": style["padx"],
-            "border_dist": style["pady"],
-        },
-    )
+    scrollbar_style = {
+        "axis": "x",
+        "short_size": style["height"],
+        "padding": style["padx"],
+        "border_dist": style["pady"],
+    }
+    parser = _MarkDownParser(source, scrollbar_style)
+    discarded = path = None
+    if checkpoint is not None and source.startswith(checkpoint[1]):
+        # only the text after the last complete element is parsed again
+        state, parsed = checkpoint
+        parser._restore(state)
+        discarded = state["stack"][state["stack_len"] :] + parser.replaced
+    elif cache_dir is not None:
+        path = _md_cache_path(cache_dir, source)
+        stack = _md_cache_load(path, scrollbar_style)
+        if stack is not None:
+            # no checkpoint is stored, the next append parses everything
+            return stack, None, None
     parser._parse()
-    markdown._parse_result = parser.stack
+    if path is not None:
+        _md_cache_dump(path, parser.stack)
+    if parser.checkpoint is None:
+        return parser.stack, None, discarded
+    parser.checkpoint["stack"] = parser.stack
+    return parser.stack, (parser.checkpoint, source), discarded
+
+
+def _md_cache_path(cache_dir, source: str):
+    from mili import VERSION_STR
+
+    key = hashlib.sha256(
+        f"{VERSION_STR}:{_MD_PARSER_VERSION}:".encode()
+        + source.encode("utf-8", "surrogatepass")
+    ).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _md_cache_load(path, scrollbar_style):
+    # a missing or unreadable file is a miss, the source is parsed again
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        return [_md_element_load(el, scrollbar_style) for el in data]
+    except (OSError, ValueError, LookupError, TypeError):
+        return None
+
+
+def _md_cache_dump(path, stack):
+    data = json.dumps([_md_element_dump(el) for el in stack])
+    _md_cache_write(path, data.encode("utf-8"))
+
+
+def _md_cache_write(path, data: bytes):
+    # written to a temporary file first so that a reader never sees half of it
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _md_element_dump(element: "_MDElement"):
+    content = element.content
+    if isinstance(content, _MDElement):
+        content = {"element": _md_element_dump(content)}
+    elif element.type == "table":
+        content = {
+            "aligns": content["aligns"],
+            "rows": [[_md_element_dump(dt) for dt in row] for row in content["rows"]],
+        }
+    return [element.type, element.indent, element.level, content]
+
+
+def _md_element_load(data, scrollbar_style) -> "_MDElement":
+    type_, indent, level, content = data
+    if isinstance(content, dict) and "element" in content:
+        content = _md_element_load(content["element"], scrollbar_style)
+    elif type_ == "table":
+        rows = [
+            [_md_element_load(dt, scrollbar_style) for dt in row]
+            for row in content["rows"]
+        ]
+        content = {"aligns": content["aligns"], "titles": rows[0], "rows": rows[1:]}
+    return _MDElement(type_, content, indent, level, scrollbar_style=scrollbar_style)
+
+
+def _markdown_parse_async(markdown: "MarkDown", parse_id, source, checkpoint):
+    parsed = _markdown_parse(source, markdown.style, checkpoint)
+    _md_parsed.append((markdown, parse_id, parsed))
+
+
+def _markdown_swap():
+    # the results of the threads are applied when MILI starts, never mid frame
+    while _md_parsed:
+        markdown, parse_id, parsed = _md_parsed.pop(0)
+        # an older parse finishing late is dropped
+        if parse_id == markdown._parse_id:
+            _markdown_apply(markdown, parse_id, parsed)
+    while _md_images_loaded:
+        _md_image_store(*_md_images_loaded.pop(0))
+
+
+def _markdown_apply(markdown: "MarkDown", parse_id, parsed):
+    stack, checkpoint, discarded = parsed
+    if discarded is None:
+        markdown._extents = {}
+    else:
+        for element in discarded:
+            markdown._heights.pop(id(element), None)
+            markdown._extents.pop(id(element), None)
+    markdown._parse_result = stack
+    markdown._checkpoint = checkpoint
+    markdown._ready_id = parse_id
+    if markdown.ready_callback is not None:
+        markdown.ready_callback()
 
 
 def _color_str(col):
@@ -699,7 +975,6 @@ class _MDElement:
         if cache is None and (self.type == "paragraph" or self.type == "code-block"):
             self.cache = TextCache()
         if self.type == "image":
-            self.image_cache = ImageCache()
             self.alt_element = _MDElement(
                 "paragraph",
                 f"[{self.content['alt']}]"
@@ -761,36 +1036,114 @@ class _MarkDownParser:
         self.ignore_start = False
         self.d_n_b = False
         self.trail = ""
+        # text inserted after the current character, read before the source
+        self.pending = ""
         self.inside_code = False
         self.inside_cblock = False
+        self.checkpoint = None
+        self.replaced: list[_MDElement] = []
+
+    def _save(self):
+        # the parser never looks past the current character, so the state
+        # between two elements can be resumed with more text after it
+        self.checkpoint = {
+            "idx": self.idx,
+            "char": self.char,
+            "last_char": self.last_char,
+            "last_last_char": self.last_last_char,
+            "last_last_last_char": self.last_last_last_char,
+            "stack_len": len(self.stack),
+            "last_paragraph": self.last_paragraph,
+            "paragraph_content": None
+            if self.last_paragraph is None
+            else self.last_paragraph.content,
+            "ignore_start": self.ignore_start,
+            "d_n_b": self.d_n_b,
+            "trail": self.trail,
+            "pending": self.pending,
+            "inside_code": self.inside_code,
+            "inside_cblock": self.inside_cblock,
+        }
+
+    def _restore(self, state):
+        self.idx = state["idx"]
+        self.char = state["char"]
+        self.last_char = state["last_char"]
+        self.last_last_char = state["last_last_char"]
+        self.last_last_last_char = state["last_last_last_char"]
+        self.stack = state["stack"][: state["stack_len"]]
+        self.last_paragraph = state["last_paragraph"]
+        if self.last_paragraph is not None:
+            self.last_paragraph = self._detach(self.last_paragraph)
+            self.last_paragraph.content = state["paragraph_content"]
+        self.ignore_start = state["ignore_start"]
+        self.d_n_b = state["d_n_b"]
+        self.trail = state["trail"]
+        self.pending = state["pending"]
+        self.inside_code = state["inside_code"]
+        self.inside_cblock = state["inside_cblock"]
+        self.eof = False
+
+    def _detach(self, paragraph: _MDElement):
+        # the old elements might still be shown, the paragraph and the elements
+        # containing it are continued as copies
+        path = []
+        element = self.stack[-1] if self.stack else None
+        while element is not paragraph:
+            if element is None or not isinstance(element.content, _MDElement):
+                return paragraph
+            path.append(element)
+            element = element.content
+        self.replaced.append(self.stack[-1])
+        child = paragraph = copy.copy(paragraph)
+        for element in reversed(path):
+            element = copy.copy(element)
+            element.content = child
+            child = element
+        self.stack[-1] = child
+        return paragraph
 
     def _advance(self):
-        self.idx += 1
-        if self.idx > len(self.source) - 1:
-            self.eof = True
-            self.char = "\0"
-            self.ignore_start = False
-            return True
+        if self.pending:
+            char = self.pending[0]
+            self.pending = self.pending[1:]
+        else:
+            self.idx += 1
+            if self.idx > len(self.source) - 1:
+                self.eof = True
+                self.char = "\0"
+                self.ignore_start = False
+                return True
+            char = self.source[self.idx]
         self.last_last_last_char = self.last_last_char
         self.last_last_char = self.last_char
         self.last_char = self.char
-        self.char = self.source[self.idx]
-        if self.char == "`":
+        self.char = char
+        if char == "`":
             self.inside_code = not self.inside_code
-        self.trail += self.char
-        if len(self.trail) > 4:
-            self.trail = self.trail[1:]
-        if not self.inside_code and not self.inside_cblock:
+        self.trail = self.trail[-3:] + char
+        if char == ">" and not self.inside_code and not self.inside_cblock:
             if self.trail == "<br>":
-                self.source = (
-                    self.source[: self.idx + 1] + "\n" + self.source[self.idx + 1 :]
-                )
+                self.pending = "\n" + self.pending
             elif self.trail == "<hr>":
-                self.source = (
-                    self.source[: self.idx + 1]
-                    + "\n---\n"
-                    + self.source[self.idx + 1 :]
-                )
+                self.pending = "\n---\n" + self.pending
+
+    def _advance_line(self):
+        # same as calling _advance until the last character of the line when
+        # none of the characters changes the parser state
+        start = self.idx + 1
+        end = self.source.find("\n", start)
+        if end < 0:
+            end = len(self.source)
+        text = self.source[start:end]
+        if self.pending or len(text) < 4 or "`" in text or ">" in text:
+            return None
+        self.idx = end - 1
+        self.last_last_last_char, self.last_last_char, self.last_char, self.char = text[
+            -4:
+        ]
+        self.trail = text[-4:]
+        return text
 
     def _start_paragraph_or_append(self, buffer, add_newline=True):
         if self.last_paragraph is not None:
@@ -1391,6 +1744,9 @@ class _MarkDownParser:
         buf = start_buf
         while self.char != "\n":
             buf += self.char
+            text = self._advance_line()
+            if text is not None:
+                buf += text
             if self._advance():
                 return self._start_paragraph_or_append(buf)
         if newline_break:
@@ -1418,6 +1774,7 @@ class _MarkDownParser:
             while self.char == "\n":
                 self._advance()
         while not self.eof:
+            self._save()
             result = self._parse_element(d_n_b=self.d_n_b)
             if self.last_paragraph is None:
                 self.d_n_b = False
@@ -1445,7 +1802,7 @@ class _MarkDownToHTMLParser:
         self.last_last_char = None
         self.eof = False
         self.stack = []
-        self.output = ""
+        self.output: list[str] = []
         self.open_i = False
         self.i_char = None
         self.b_char = None
@@ -1465,7 +1822,7 @@ class _MarkDownToHTMLParser:
         self.char = self.source[self.idx]
 
     def _add(self, buf):
-        self.output += buf
+        self.output.append(buf)
 
     def _parse_mul_underscore(self, keychar):
         previous = self.last_char
@@ -1618,7 +1975,9 @@ class _MarkDownToHTMLParser:
                 return self._add(buf)
         self._advance()
         code_buf = code_buf.replace("<", "&lt;").replace(">", "&gt;")
-        self.output += f'<color fg="{_color_str(self.style["code_text_color"])}" bg="{_color_str(self.style["code_bg_color"])}"> {code_buf} </color>'
+        self.output.append(
+            f'<color fg="{_color_str(self.style["code_text_color"])}" bg="{_color_str(self.style["code_bg_color"])}"> {code_buf} </color>'
+        )
 
     def _parse_lessthan(self):
         previous = self.last_char
@@ -1643,7 +2002,7 @@ class _MarkDownToHTMLParser:
             if self._advance():
                 return self._add(buf)
         self._advance()
-        self.output += f'<a href="{link_buf}">{link_buf}</a>'
+        self.output.append(f'<a href="{link_buf}">{link_buf}</a>')
 
     def _parse_link(self):
         previous = self.last_char
@@ -1704,12 +2063,12 @@ class _MarkDownToHTMLParser:
                 elif self.char == "\\":
                     self._parse_backslash()
                 else:
-                    self.output += self.char
+                    self.output.append(self.char)
                     self._advance()
             else:
-                self.output += self.char
+                self.output.append(self.char)
                 self._advance()
-        return self.output
+        return "".join(self.output)
 
 
 def _markdown_to_html(
@@ -1724,6 +2083,7 @@ def _markdown_to_html(
 def _comp_init(ctx, raw_text: str, style: dict, cache: "TextCache", user_size):
     rebuild = False
     parse_html = False
+    restyle = False
     padx = ctx._style_val(style, "text", "padx", 5)
     pad = ctx._style_val(style, "text", "pad", None)
     if pad is not None:
@@ -1755,6 +2115,10 @@ def _comp_init(ctx, raw_text: str, style: dict, cache: "TextCache", user_size):
             parse_html = (
                 diff_txt or diff_style or diff_def_style or cache._rich["conds_changed"]
             )
+            # only conditional tags changed, the lines might be reused
+            restyle = not (diff_txt or diff_style or diff_def_style) and (
+                wraplen == cache._rich["wraplen"]
+            )
             if diff_txt:
                 cache._rich["active_tags"] = set()
         if not rebuild:
@@ -1772,15 +2136,26 @@ def _comp_init(ctx, raw_text: str, style: dict, cache: "TextCache", user_size):
         cache._rich["user_size"] = user_size
         cache._rich["wraplen"] = wraplen
         cache._rich["default_style"] = default_text.copy()
-        _process(ctx, raw_text, style, cache, user_size[1], parse_html, wraplen)
+        _process(
+            ctx, raw_text, style, cache, user_size[1], parse_html, wraplen, restyle
+        )
 
 
 def _process(
-    ctx, raw_text: str, style: dict, cache: "TextCache", uh, parse_html, wraplen
+    ctx,
+    raw_text: str,
+    style: dict,
+    cache: "TextCache",
+    uh,
+    parse_html,
+    wraplen,
+    restyle=False,
 ):
     rich = cache._rich
     if rich is None:
         return
+    old_render_data = rich.get("render_data", {})
+    old_spans = rich.get("spans", None)
     rich["render_data"] = {}
     rich["full_surf"] = None
     rich["render_full"] = False
@@ -1794,46 +2169,71 @@ def _process(
         markdown_style,
         default_mods,
         textbox,
+        outline_size,
     ) = _process_styles(ctx, style, uh)
+    if outline_size != rich.get("outline_size", None):
+        old_render_data = {}
+    rich["outline_size"] = outline_size
     if parse_html:
         if textbox:
             raw_text = raw_text.replace("<", "&lt;").replace(">", "&gt;")
         if markdown:
             raw_text = _markdown_to_html(raw_text, markdown_style)
-        clean_text, chars_mods, any_tag = _RICH_TEXT_PARSER.rich_text_parse(
+        clean_text, spans, any_tag = _parse_rich_text(
             raw_text, default_mods, rich["active_tags"], link_color
         )
         rich["clean_text"] = clean_text
-        rich["chars_mods"] = chars_mods
+        rich["spans"] = spans
         if not any_tag and line_space == 0:
             rich["render_full"] = True
             rich["full_surf"], rich["size"] = _process_render_full(
-                ctx, clean_text, default_mods, wraplen, fontalign
+                ctx, clean_text, default_mods, wraplen, fontalign, outline_size
             )
             return
-    clean_text, chars_mods = rich["clean_text"], rich["chars_mods"]
-    lines, overflow = _process_lines_wrap(
-        ctx, clean_text, chars_mods, default_mods, wraplen
-    )
+    clean_text, spans = rich["clean_text"], rich["spans"]
+    if (
+        restyle
+        and "lines" in rich
+        and old_spans is not None
+        and _spans_same_metrics(old_spans, spans)
+    ):
+        lines, overflow = rich["lines"], rich["wrap_overflow"]
+    else:
+        lines, overflow = _process_lines_wrap(
+            ctx, clean_text, spans, default_mods, wraplen
+        )
     lines_data, longest_line = _process_lines_blocks(
-        lines, ctx, chars_mods, default_mods
+        lines, ctx, clean_text, spans, default_mods
     )
-    if default_mods["oc"] is not None:
-        longest_line += 1
-    output_blocks, total_h = _process_block_rects(
+    outline = 0 if default_mods["oc"] is None else outline_size
+    longest_line += outline
+    output_blocks, lines_index, total_h = _process_block_rects(
         lines_data,
         longest_line,
         fontalign,
         y_align,
         line_space,
-        default_mods["oc"] is not None,
+        outline,
     )
     rich["wrap_overflow"] = overflow
     rich["size"] = (longest_line, total_h)
     rich["blocks"] = output_blocks
+    rich["lines_index"] = lines_index
+    rich["lines"] = lines
+    rich["cond_tags"] = {
+        tagid: condition
+        for block in output_blocks
+        for tagid, condition in block["mods"]["conds"].items()
+    }
+    # blocks that look the same keep their surfaces
+    render_data = rich["render_data"]
+    for block in output_blocks:
+        surface = old_render_data.get(block["key"], None)
+        if surface is not None:
+            render_data[block["key"]] = surface
 
 
-def _process_render_full(ctx, txt, mods, wraplen, fontalign):
+def _process_render_full(ctx, txt, mods, wraplen, fontalign, outline_size):
     font = ctx._get_font_from(mods["fn"], mods["fs"], mods["sf"])
     font.align = fontalign
     font.bold = mods["b"]
@@ -1843,22 +2243,21 @@ def _process_render_full(ctx, txt, mods, wraplen, fontalign):
     oc = mods["oc"]
     size = font.render(txt, mods["fa"], "white").size
     wraplen = min(max(0, int(wraplen)), int(size[0] * 1.1))
-    surf = ctx._canva._get_image(
-        font.render(
-            txt,
-            mods["fa"],
-            mods["fc"],
-            mods["bc"] if oc is None else None,
-            int(wraplen),
-        )
+    surf = font.render(
+        txt,
+        mods["fa"],
+        mods["fc"],
+        mods["bc"] if oc is None else None,
+        int(wraplen),
     )
     size = surf.width, surf.height
     if oc is not None:
-        surf2 = ctx._canva._get_image(
-            font.render(txt, mods["fa"], oc, mods["bc"], int(wraplen))
+        surf = _coreutils._outline_surface(
+            surf,
+            font.render(txt, mods["fa"], oc, mods["bc"], int(wraplen)),
+            outline_size,
         )
-        surf = (surf2, surf)
-    return surf, size
+    return ctx._canva._get_image(surf), size
 
 
 def _process_styles(ctx, style, uh):
@@ -1893,16 +2292,21 @@ def _process_styles(ctx, style, uh):
         markdown_style,
         default_mods,
         _style_val(style, "text", "_textbox", False),
+        max(1, int(_style_val(style, "text", "rich_outline_size", 1))),
     )
 
 
 def _process_block_rects(
-    lines_data, longest_line, fontalign, y_align, line_space, outlined
+    lines_data, longest_line, fontalign, y_align, line_space, outline
 ):
     output_blocks = []
-    cur_h = int(outlined)
+    lines_index = []
+    cur_h = outline
     for line in lines_data:
-        cur_w = int(outlined)
+        cur_w = outline
+        lines_index.append(
+            (cur_h, cur_h + line["h"], len(output_blocks), len(output_blocks))
+        )
         for block in line["blocks"]:
             posx = cur_w
             if fontalign == pygame.FONT_RIGHT:
@@ -1915,24 +2319,84 @@ def _process_block_rects(
             elif y_align == "center":
                 posy = cur_h + line["h"] / 2 - block["h"] / 2
             rect = pygame.Rect(posx, posy, block["w"], block["h"])
+            mods = block["mods"]
             output_blocks.append(
                 {
                     "text": block["text"],
                     "rect": rect,
-                    "mods": block["mods"],
+                    "mods": mods,
                     "font": block["font"],
+                    "key": (
+                        block["text"],
+                        block["font"],
+                        *(_coreutils._color_key(mods[key]) for key in _RENDER_KEYS),
+                    ),
                 }
             )
             cur_w += block["w"]
+        top, bottom, start, _ = lines_index[-1]
+        lines_index[-1] = (top, bottom, start, len(output_blocks))
         cur_h += line["h"] + line_space
     cur_h -= line_space
-    return output_blocks, cur_h + 2 * outlined
+    return output_blocks, lines_index, cur_h + 2 * outline
+
+
+_span_end = operator.itemgetter(1)
+_line_top = operator.itemgetter(0)
+_line_bottom = operator.itemgetter(1)
+_METRIC_KEYS = ("b", "i", "fn", "fs", "sf")
+_RENDER_KEYS = ("b", "i", "u", "s", "fa", "fc", "bc", "oc")
+
+
+def _spans_runs(spans, start, end, default_mods):
+    # the (start, end, mods) runs covering the text between start and end
+    si = bisect.bisect_right(spans, start, key=_span_end)
+    pos = start
+    while pos < end:
+        if si < len(spans) and spans[si][0] <= pos:
+            run_end = min(spans[si][1], end)
+            mods = spans[si][2]
+            si += 1
+        else:
+            run_end = end if si >= len(spans) else min(spans[si][0], end)
+            mods = default_mods
+        yield pos, run_end, mods
+        pos = run_end
+
+
+def _lines_range(lines_index, top, bottom):
+    # the lines overlapping the vertical range, relative to the text
+    return range(
+        bisect.bisect_right(lines_index, top, key=_line_bottom),
+        bisect.bisect_left(lines_index, bottom, key=_line_top),
+    )
+
+
+def _spans_same_metrics(spans, other_spans):
+    # the spans of the same text only differ in the active conditional tags
+    if len(spans) != len(other_spans):
+        return False
+    for (start, end, mods), (ostart, oend, omods) in zip(spans, other_spans):
+        if start != ostart or end != oend:
+            return False
+        for key in _METRIC_KEYS:
+            if mods[key] != omods[key]:
+                return False
+    return True
+
+
+def _spans_mods(spans, i, default_mods):
+    si = bisect.bisect_right(spans, i, key=_span_end)
+    if si < len(spans) and spans[si][0] <= i:
+        return spans[si][2]
+    return default_mods
 
 
 def _process_lines_blocks(
     lines,
     ctx,
-    chars_mods,
+    clean_text,
+    spans,
     default_mods,
 ):
     lines_data = []
@@ -1946,7 +2410,7 @@ def _process_lines_blocks(
         line_w = 0
         line_h = 0
         if line == "\n":
-            cur_mods = chars_mods.get(ci, default_mods)
+            cur_mods = _spans_mods(spans, ci, default_mods)
             cur_font = ctx._get_font_from(
                 cur_mods["fn"], cur_mods["fs"], cur_mods["sf"]
             )
@@ -1964,8 +2428,13 @@ def _process_lines_blocks(
             prev_font = cur_font
             ci += 1
         else:
-            for li, char in enumerate(line):
-                cur_mods = chars_mods.get(ci, default_mods)
+            line_end = ci + len(line)
+            # spaces where the line was wrapped are not drawn
+            trim_start = ci if lsi != 0 else -1
+            trim_end = line_end - 1 if lsi < len(lines) - 1 else -1
+            for run_start, run_end, cur_mods in _spans_runs(
+                spans, ci, line_end, default_mods
+            ):
                 cur_font = ctx._get_font_from(
                     cur_mods["fn"], cur_mods["fs"], cur_mods["sf"]
                 )
@@ -1973,19 +2442,13 @@ def _process_lines_blocks(
                     prev_mods = cur_mods
                 if prev_font is None:
                     prev_font = cur_font
-                cur_font.bold = cur_mods["b"]
-                cur_font.italic = cur_mods["i"]
-                cur_font.underline = cur_mods["u"]
-                cur_font.strikethrough = cur_mods["s"]
-                if char == "\n":
-                    char = ""
-                if char == " " and (
-                    (li == 0 and lsi != 0)
-                    or (li == len(line) - 1 and lsi < len(lines) - 1)
-                ):
-                    char = ""
+                text = clean_text[run_start:run_end]
+                if run_start == trim_start and text[0] == " ":
+                    text = text[1:]
+                if text[-1:] == "\n" or (run_end - 1 == trim_end and text[-1:] == " "):
+                    text = text[:-1]
                 if cur_mods == prev_mods:
-                    block += char
+                    block += text
                 else:
                     assert prev_font is not None and prev_mods is not None
                     prev_font.bold = prev_mods["b"]
@@ -2006,11 +2469,15 @@ def _process_lines_blocks(
                             "font": prev_font,
                         }
                     )
-                    block = char
+                    block = text
                 prev_mods = cur_mods
                 prev_font = cur_font
-                ci += 1
+            ci = line_end
             if block and prev_font is not None:
+                prev_font.bold = prev_mods["b"]
+                prev_font.italic = prev_mods["i"]
+                prev_font.underline = prev_mods["u"]
+                prev_font.strikethrough = prev_mods["s"]
                 block_w = prev_font.size(block)[0]
                 block_h = prev_font.get_height()
                 line_w += block_w
@@ -2031,72 +2498,83 @@ def _process_lines_blocks(
     return lines_data, longest_line
 
 
-def _process_lines_wrap(ctx, clean_text, chars_mods, default_mods, wraplen):
+def _process_lines_wrap(ctx, clean_text, spans, default_mods, wraplen):
+    # widths are the sum of cached advances, corrected with the measured size
+    # of every part of a word with the same font and style when it ends
     lines = []
-    word = ""
-    line = ""
-    block = ""
-    block_w = 0
-    line_w = 0
-    prev_font = None
-    word_start_line = True
     overflow = False
-    for i, char in enumerate(clean_text):
-        cur_mods = chars_mods.get(i, default_mods)
-        cur_font = ctx._get_font_from(cur_mods["fn"], cur_mods["fs"], cur_mods["sf"])
-        cur_font.bold = cur_mods["b"]
-        cur_font.italic = cur_mods["i"]
-        cur_font.underline = cur_mods["u"]
-        cur_font.strikethrough = cur_mods["s"]
-        if char == "\n":
-            lines.append(line + "\n")
-            line_w = 0
-            block_w = 0
-            block = ""
-            word = ""
-            line = ""
-            prev_font = cur_font
-            continue
-        if char == " ":
-            word = ""
-            new_word = ""
-            word_start_line = False
-        else:
-            new_word = word + char
-        if cur_font == prev_font:
-            new_block = block + char
-        else:
-            line_w += block_w
-            new_block = char
-        new_block_w = cur_font.size(block)[0]
-        if wraplen > 0 and line_w + new_block_w > wraplen:
-            overflow = True
-            if word and not word_start_line:
-                line = line[: -len(word)]
-                lines.append(line)
-                word = new_word
-                line = new_word
-                block = new_word
-                block_w = cur_font.size(block)[0]
+    line_start = 0
+    line_w = 0
+    word_start = -1
+    word_w = 0
+    piece_start = -1
+    piece_w = 0
+    piece_font = piece_style = None
+    fonts = {}
+    for span_start, span_end, mods in _spans_runs(
+        spans, 0, len(clean_text), default_mods
+    ):
+        entry = fonts.get(id(mods), None)
+        if entry is None:
+            font = ctx._get_font_from(mods["fn"], mods["fs"], mods["sf"])
+            style = (mods["b"], mods["i"], mods["u"], mods["s"])
+            entry = fonts[id(mods)] = (
+                font,
+                style,
+                _glyphs._get_metrics(font, style)[0],
+            )
+        font, style, advances = entry
+        for i in range(span_start, span_end):
+            char = clean_text[i]
+            if piece_start >= 0 and (
+                char == " "
+                or char == "\n"
+                or font is not piece_font
+                or style != piece_style
+            ):
+                if i - piece_start > 1:
+                    _glyphs._set_font_style(piece_font, piece_style)
+                    kerning = piece_font.size(clean_text[piece_start:i])[0] - piece_w
+                    line_w += kerning
+                    word_w += kerning
+                piece_start = -1
+            if char == "\n":
+                lines.append(clean_text[line_start : i + 1])
+                line_start = i + 1
                 line_w = 0
-                word_start_line = True
-                prev_font = cur_font
+                word_start = -1
+                continue
+            advance = advances.get(char, None)
+            if advance is None:
+                _glyphs._add_metrics(font, style, char)
+                advance = advances[char]
+            if wraplen > 0 and line_w + advance > wraplen and i > line_start:
+                overflow = True
+                if char != " " and word_start > line_start:
+                    # move the word to the next line
+                    lines.append(clean_text[line_start:word_start])
+                    line_start = word_start
+                    line_w = word_w
+                else:
+                    lines.append(clean_text[line_start:i])
+                    line_start = i
+                    line_w = 0
+                    word_start = -1
+            if char == " ":
+                word_start = -1
             else:
-                lines.append(line)
-                line = char
-                block = char
-                word = char if char != " " else ""
-                block_w = cur_font.size(char)[0]
-                line_w = 0
-                prev_font = cur_font
-        else:
-            block = new_block
-            block_w = new_block_w
-            word = new_word
-            line += char
-            prev_font = cur_font
-    if line:
-        lines.append(line)
+                if word_start < 0:
+                    word_start = i
+                    word_w = 0
+                if piece_start < 0:
+                    piece_start = i
+                    piece_w = 0
+                    piece_font, piece_style = font, style
+                piece_w += advance
+                word_w += advance
+            line_w += advance
+    if line_start < len(clean_text):
+        lines.append(clean_text[line_start:])
     return lines, overflow
 
 
@@ -2119,6 +2597,29 @@ def _process_default_mods(ctx, style):
     }
 
 
+def _render_block(canva: "_AbstractCanva", block, outline_size):
+    font: pygame.Font = block["font"]
+    mods = block["mods"]
+    font.bold = mods["b"]
+    font.italic = mods["i"]
+    font.underline = mods["u"]
+    font.strikethrough = mods["s"]
+    outline_col = mods["oc"]
+    surface = font.render(
+        block["text"],
+        mods["fa"],
+        mods["fc"],
+        mods["bc"] if outline_col is None else None,
+    )
+    if outline_col is not None:
+        surface = _coreutils._outline_surface(
+            surface,
+            font.render(block["text"], mods["fa"], outline_col, mods["bc"]),
+            outline_size,
+        )
+    return canva._get_image(surface)
+
+
 def _render(
     ctx, cache: "TextCache", absr: pygame.Rect, blit_flags, align, padx, pady, actions
 ):
@@ -2126,108 +2627,76 @@ def _render(
     rich = cache._rich
     if rich is None:
         return
+    outline_size = rich["outline_size"]
     if rich["render_full"]:
+        rect = pygame.Rect((0, 0), rich["size"]).move_to(
+            **_coreutils._align_rect(align, absr, padx, pady)
+        )
+        # outlined text extends the text size on every side
         surf = rich["full_surf"]
-        if isinstance(surf, pygame.Surface | pgvideo.Texture):
-            rect = surf.get_rect(**_coreutils._align_rect(align, absr, padx, pady))
-            canva._blit(surf, rect, special_flags=blit_flags)
-        else:
-            rect = surf[1].get_rect(**_coreutils._align_rect(align, absr, padx, pady))
-            for direction in _coreutils._OUTLINE_OFFSETS_CENTERED:
-                canva._blit(
-                    surf[0],
-                    (rect.x + direction[0], rect.y + direction[1]),
-                    special_flags=blit_flags,
-                )
-            canva._blit(surf[1], rect, special_flags=blit_flags)
+        canva._blit(surf, surf.get_rect(center=rect.center), special_flags=blit_flags)
         return
     clip = canva._get_clip()
     full_rect = pygame.Rect((0, 0), rich["size"]).move_to(
         **_coreutils._align_rect(align, absr, padx, pady)
     )
-    tags_changed = False
-    tags_stats = {}
-    active_tags = rich["active_tags"]
-    offset = pygame.Vector2(full_rect.topleft)
+    ox, oy = full_rect.topleft
+    blocks = rich["blocks"]
+    lines_index = rich["lines_index"]
     render_data = rich["render_data"]
-    mpos = pygame.Vector2(pygame.mouse.get_pos())
-    pressed = pygame.mouse.get_pressed()
-    just_pressed = pygame.mouse.get_just_pressed()
-    just_released = pygame.mouse.get_just_released()
-    for i, block in enumerate(rich["blocks"]):
-        rect = block["rect"]
-        rect = rect.move_to(topleft=rect.topleft + offset)
-        mods = block["mods"]
-        if not rect.colliderect(clip):
-            for tagid, condition in mods["conds"].items():
-                if tagid not in tags_stats:
-                    tags_stats[tagid] = {"add": 0, "remove": 0}
-                if condition in ["hovered", "pressed"]:
-                    if tagid in active_tags:
-                        tags_stats[tagid]["remove"] += 1
-            continue
-        if i in render_data:
-            surface = render_data[i]
-        else:
-            font: pygame.Font = block["font"]
-            font.bold = mods["b"]
-            font.italic = mods["i"]
-            font.underline = mods["u"]
-            font.strikethrough = mods["s"]
-            outline_col = mods["oc"]
-            surface = canva._get_image(
-                font.render(
-                    block["text"],
-                    mods["fa"],
-                    mods["fc"],
-                    mods["bc"] if outline_col is None else None,
-                )
-            )
-            if outline_col is not None:
-                outline_surf = canva._get_image(
-                    font.render(block["text"], mods["fa"], outline_col, mods["bc"])
-                )
-                surface = (outline_surf, surface)
-            render_data[i] = surface
-        if isinstance(surface, pygame.Surface | pgvideo.Texture):
+    # outlined blocks extend outside of their line
+    for li in _lines_range(
+        lines_index, clip.top - oy - outline_size, clip.bottom - oy + outline_size
+    ):
+        _, _, start, end = lines_index[li]
+        for bi in range(start, end):
+            block = blocks[bi]
+            rect = block["rect"].move(ox, oy)
+            outlined = block["mods"]["oc"] is not None
+            if outlined:
+                rect = rect.inflate(outline_size * 2, outline_size * 2)
+            if not rect.colliderect(clip):
+                continue
+            if block["key"] in render_data:
+                surface = render_data[block["key"]]
+            else:
+                surface = _render_block(canva, block, outline_size)
+                render_data[block["key"]] = surface
+            if outlined:
+                # the renderer draws the texture with the size of the rect
+                rect = pygame.Rect(rect.topleft, (surface.width, surface.height))
             canva._blit(surface, rect, special_flags=blit_flags)
-        else:
-            for direction in _coreutils._OUTLINE_OFFSETS_CENTERED:
-                canva._blit(
-                    surface[0],
-                    (rect.x + direction[0], rect.y + direction[1]),
-                    special_flags=blit_flags,
-                )
-            canva._blit(surface[1], rect, special_flags=blit_flags)
-        hovered = rect.collidepoint(mpos)
+    # only the visible blocks under the mouse can be hovered
+    mpos = ctx._mouse_pos
+    hovered_blocks = []
+    for li in _lines_range(lines_index, mpos[1] - oy, mpos[1] - oy + 1):
+        _, _, start, end = lines_index[li]
+        for bi in range(start, end):
+            block = blocks[bi]
+            rect = block["rect"].move(ox, oy)
+            if rect.collidepoint(mpos) and rect.colliderect(clip):
+                hovered_blocks.append(block)
+    pressed = ctx._input.pressed
+    just_pressed = ctx._input.just_pressed
+    just_released = ctx._input.just_released
+    active_tags = rich["active_tags"]
+    new_tags = set()
+    toggled_tags = set()
+    for block in hovered_blocks:
+        mods = block["mods"]
         for tagid, condition in mods["conds"].items():
-            if tagid not in tags_stats:
-                tags_stats[tagid] = {"add": 0, "remove": 0}
             match condition:
                 case "hovered" | "hover":
-                    if hovered:
-                        tags_stats[tagid]["add"] += 1
-                    else:
-                        tags_stats[tagid]["remove"] += 1
+                    new_tags.add(tagid)
                 case "pressed" | "press":
-                    if hovered and pressed[0]:
-                        tags_stats[tagid]["add"] += 1
-                    else:
-                        tags_stats[tagid]["remove"] += 1
+                    if pressed[0]:
+                        new_tags.add(tagid)
                 case "just-pressed":
-                    if hovered and just_pressed[0]:
-                        if tagid not in active_tags:
-                            tags_stats[tagid]["add"] += 1
-                        else:
-                            tags_stats[tagid]["remove"] += 1
+                    if just_pressed[0]:
+                        toggled_tags.add(tagid)
                 case "just-released":
-                    if hovered and just_released[0]:
-                        if tagid not in active_tags:
-                            tags_stats[tagid]["add"] += 1
-                        else:
-                            tags_stats[tagid]["remove"] += 1
-        if not hovered:
-            continue
+                    if just_released[0]:
+                        toggled_tags.add(tagid)
         for actiond in mods["actions"]:
             aname, acond, abtn, adat = (
                 actiond["name"],
@@ -2252,48 +2721,97 @@ def _render(
                 case "just-released":
                     if just_released[abtn - 1]:
                         action(adat)
-    for tagid, stats in tags_stats.items():
-        add = stats["add"]
-        remove = stats["remove"]
-        if add > 0:
-            if tagid not in active_tags:
+    tags_changed = False
+    for tagid, condition in rich["cond_tags"].items():
+        if condition in ("hovered", "hover", "pressed", "press"):
+            active = tagid in new_tags
+        elif tagid in toggled_tags:
+            active = tagid not in active_tags
+        else:
+            continue
+        if active != (tagid in active_tags):
+            if active:
                 active_tags.add(tagid)
-                tags_changed = True
-        elif remove > 0:
-            if tagid in active_tags:
+            else:
                 active_tags.remove(tagid)
-                tags_changed = True
+            tags_changed = True
     rich["conds_changed"] = tags_changed
 
 
-class _RichTextParser(html.parser.HTMLParser):
-    def __init__(self):
-        super().__init__()
+_MODS_KEYS = ("b", "i", "u", "s", "fa", "fc", "bc", "oc", "fn", "fs", "sf")
+_TAG_RE = re.compile(
+    r"<(/?)([a-zA-Z][^\t\n\r\f />\x00]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>"
+)
+_ATTR_RE = re.compile(
+    r"([^\s/>=][^\s/=>]*)(?:\s*=+\s*('[^']*'|\"[^\"]*\"|(?![\'\"])[^>\s]*))?"
+)
+_IGNORED_RE = re.compile(r"<!--.*?-->|<[!?][^>]*>|</(?![a-zA-Z])[^>]*>", re.DOTALL)
+_parse_cache: OrderedDict[tuple, tuple[str, list, bool]] = OrderedDict()
+_MAX_PARSES = 256
+_attr_colors: OrderedDict[str, tuple[int, int, int, int] | None] = OrderedDict()
+_MAX_ATTR_COLORS = 256
+
+
+def _parse_rich_text(raw_text, default_mods, active_tags, link_color):
+    # the spans only reference copies of the mods, so results can be shared
+    key = (
+        raw_text,
+        tuple(_coreutils._color_key(default_mods[key]) for key in _MODS_KEYS),
+        frozenset(active_tags),
+        _color_str(link_color),
+    )
+    result = _parse_cache.get(key, None)
+    if result is not None:
+        _parse_cache.move_to_end(key)
+        return result
+    result = _parse_cache[key] = _RICH_TEXT_PARSER.rich_text_parse(
+        raw_text, default_mods, active_tags, link_color
+    )
+    if len(_parse_cache) > _MAX_PARSES:
+        _parse_cache.popitem(last=False)
+    return result
+
+
+def _attr_color(value):
+    # shared between spans, so the colors are stored as immutable tuples
+    if value in _attr_colors:
+        _attr_colors.move_to_end(value)
+        return _attr_colors[value]
+    try:
+        color = tuple(eval(f"pygame.Color({value})", {"pygame": pygame}))
+    except Exception:
+        try:
+            color = tuple(eval(f'pygame.Color("{value}")', {"pygame": pygame}))
+        except Exception:
+            color = None
+    _attr_colors[value] = color
+    if len(_attr_colors) > _MAX_ATTR_COLORS:
+        _attr_colors.popitem(last=False)
+    return color
+
+
+def _attr_value(value):
+    if value is None:
+        return None
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+    if "&" in value:
+        value = html.unescape(value)
+    return value
+
 
+class _RichTextParser:
     def rich_text_parse(self, raw_text, default_mods, active_tags, link_color):
         self.active_tags = active_tags
-        self.clean_text = ""
+        self.text_parts = []
+        self.text_len = 0
         self.mods_stack: dict[str, list] = {}
         self.link_color = _color_str(link_color)
-        for key in [
-            "b",
-            "i",
-            "u",
-            "s",
-            "fa",
-            "fc",
-            "bc",
-            "oc",
-            "fn",
-            "fs",
-            "sf",
-            "conds",
-            "actions",
-        ]:
+        for key in _MODS_KEYS + ("conds", "actions"):
             self.mods_stack[key] = [default_mods[key]]
         self.any_tag = False
         self.mods = default_mods.copy()
-        self.chars_mods = {}
+        self.spans = []
         self.font_keys_stack = []
         self.color_keys_stack = []
         self.tag_indent = 0
@@ -2311,19 +2829,58 @@ class _RichTextParser(html.parser.HTMLParser):
         }
 
         self.feed(raw_text)
-        self.close()
-        return self.clean_text, self.chars_mods, self.any_tag
+        return "".join(self.text_parts), self.spans, self.any_tag
+
+    def feed(self, raw_text: str):
+        # a "<" that doesn't start a valid tag is kept as text
+        data_start = pos = 0
+        while (pos := raw_text.find("<", pos)) >= 0:
+            match = _TAG_RE.match(raw_text, pos)
+            if match is None:
+                match = _IGNORED_RE.match(raw_text, pos)
+                if match is None:
+                    pos += 1
+                    continue
+            if pos > data_start:
+                self.feed_data(raw_text[data_start:pos])
+            pos = data_start = match.end()
+            if match.re is _IGNORED_RE:
+                continue
+            closing, tag, rest = match.groups()
+            tag = tag.lower()
+            if closing:
+                self.handle_endtag(tag)
+                continue
+            self.handle_starttag(
+                tag,
+                [
+                    (aname.lower(), _attr_value(aval))
+                    for aname, aval in _ATTR_RE.findall(rest)
+                    if aname
+                ]
+                if rest
+                else [],
+            )
+            if rest.endswith("/"):
+                self.handle_endtag(tag)
+        if data_start < len(raw_text):
+            self.feed_data(raw_text[data_start:])
+
+    def feed_data(self, data: str):
+        if "&" in data:
+            data = html.unescape(data)
+        self.handle_data(data)
 
     def handle_data(self, data):
-        starti = len(self.clean_text)
-        self.clean_text += data
-        if self.tag_indent <= 0:
+        starti = self.text_len
+        self.text_parts.append(data)
+        self.text_len += len(data)
+        if self.tag_indent <= 0 or not data:
             return
         mods = self.mods.copy()
         mods["conds"] = self.mods["conds"].copy()
         mods["actions"] = self.mods["actions"].copy()
-        for i in range(starti, len(self.clean_text)):
-            self.chars_mods[i] = mods
+        self.spans.append((starti, self.text_len, mods))
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
         if tag == "a":
@@ -2404,17 +2961,10 @@ class _RichTextParser(html.parser.HTMLParser):
                         keys.append("oc")
                         values["oc"] = None
                         continue
-                    try:
-                        value = eval(f"pygame.Color({aval})", {"pygame": pygame})
+                    value = _attr_color(aval)
+                    if value is not None:
                         keys.append(key)
                         values[key] = value
-                    except Exception:
-                        try:
-                            value = eval(f'pygame.Color("{aval}")', {"pygame": pygame})
-                            keys.append(key)
-                            values[key] = value
-                        except Exception:
-                            ...
         elif tag == "action":
             action = True
             action_data = {}
@@ -385,7 +385,7 @@ das dasdasdasgdjhsgahj dsad
         return None
 
     def _update_start(self):
-        self._mpos = pygame.mouse.get_pos()
+        self._mpos = _core._globalctx._get_mouse_pos()
         if pygame.time.get_ticks() - self._cursor_time >= self.style["blink_interval"]:
             self._cursor_on = not self._cursor_on
             self._cursor_time = pygame.time.get_ticks()
@@ -844,7 +844,7 @@ class EntryLine:
         return number
 
     def ui(self, container_element: _data.Interaction):
-        mpos = pygame.mouse.get_pos()
+        mpos = _core._globalctx._get_mouse_pos()
         mposx = mpos[0]
         if pygame.time.get_ticks() - self._cursor_time >= self.style["blink_interval"]:
             self._cursor_on = not self._cursor_on
@@ -867,7 +867,7 @@ class EntryLine:
         mili = _core._globalctx._mili
         if mili is None:
             return None
-        if mili._ctx._parent["id"] != container_element.data.id:
+        if mili._ctx._parent.id != container_element.data.id:
             raise _error.MILIStatusError(
                 "Entryline's container element must be created as a parent"
             )
@@ -440,7 +440,7 @@ class Slider:
         if self.style["drag_area"] and area_element.left_pressed:
             before = self.handle_dragger.position.copy()
             diff = (
-                pygame.Vector2(pygame.mouse.get_pos())
+                pygame.Vector2(_core._globalctx._get_mouse_pos())
                 - self._area_data.absolute_rect.topleft
             )
             self.dragging_area = True
@@ -20,10 +20,12 @@ class GenericApp:
         start_style: _typing.ElementStyleLike | None = None,
         use_global_mouse: bool = False,
         canva: _canva._AbstractCanva | pygame.Surface | pgvideo.Renderer | None = None,
+        dirty_rects: bool = False,
     ):
         self.window = window
         self.clock = pygame.Clock()
         self.target_framerate: int = target_framerate
+        self.dirty_rects: bool = dirty_rects
         if canva is None:
             mili_canva = self.window.get_surface()
         else:
@@ -51,23 +53,32 @@ class GenericApp:
 
     def run(self):
         while self.running:
+            # the events are pumped first so MILI.start reads the input of this frame
+            events = pygame.event.get()
             self.mili.start(self.start_style, window_position=self.window.position)
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.WINDOWCLOSE and event.window == self.window:
                     self.quit()
                     return
                 else:
                     self.event(event)
 
+            dirty_rects = self.dirty_rects and self.mili.canva.backend == "surface"
             if self.mili.canva.backend == "surface":
                 self.mili.canva.surface = self.window.get_surface()
-            if self.clear_color is not None:
+                self.mili.canva.track_dirty = dirty_rects
+            if dirty_rects:
+                self.mili.canva.clear_color = self.clear_color
+            elif self.clear_color is not None:
                 self.mili.canva._clear(self.clear_color, self.window)
             self.update()
             self.ui()
-            self.mili.update_draw()
+            rects = self.mili.update_draw()
             self.post_draw()
-            self.mili.canva._flip(self.window)
+            if dirty_rects:
+                self.mili.canva._flip_rects(self.window, rects)
+            else:
+                self.mili.canva._flip(self.window)
             self.delta_time = self.clock.tick(self.target_framerate) / 1000
 
 
@@ -192,8 +203,9 @@ class UIApp:
                 style = {"pad": 0, "spacing": 0}
             else:
                 self.win_borders.active = False
+            events = pygame.event.get()
             self.mili.start(style, window_position=self.window.position)
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.WINDOWCLOSE and event.window == self.window:
                     self.quit()
                     return
@@ -1,10 +1,15 @@
 import pygame
 import typing
+from collections import OrderedDict
 from pygame._sdl2 import video as pgvideo
+from mili._coreutils import _color_key
 
 
 class _AbstractCanva:
     backend: str
+    track_dirty: bool = False
+    clear_color: pygame.typing.ColorLike | None = None
+    _dirty_full: bool = True
     _rect: pygame.Rect
     _offset: pygame.Vector2
     _renderer: pgvideo.Renderer
@@ -50,18 +55,36 @@ class _AbstractCanva:
         self, surface, old_source=None
     ) -> pgvideo.Texture | pygame.Surface: ...
     def _blit(self, source, dest, special_flags=0): ...
+    def _blit_areas(self, source, blits, special_flags=0): ...
     def _clear(self, color, window): ...
     def _flip(self, window): ...
     def _start(self): ...
     def _end(self): ...
+    def _retain_ready(self) -> bool: ...
+    def _retain_begin(self): ...
+    def _retain_end(self): ...
+    def _retain_reuse(self): ...
+    def _retain_release(self): ...
+    def _layer_target(self, old, size) -> pgvideo.Texture | pygame.Surface: ...
+    def _layer_begin(self, target) -> typing.Any: ...
+    def _layer_end(self, previous): ...
+    def _layer_blit(self, target, dest, alpha): ...
 
 
 class SurfaceCanva(_AbstractCanva):
     backend = "surface"
 
-    def __init__(self, surface: pygame.Surface):
+    def __init__(
+        self,
+        surface: pygame.Surface,
+        track_dirty: bool = False,
+        clear_color: pygame.typing.ColorLike | None = None,
+    ):
         self.surface = surface
+        self.track_dirty = track_dirty
+        self.clear_color = clear_color
         self._offset = pygame.Vector2()
+        self._retained: pygame.Surface | None = None
 
     @property
     def surface(self):
@@ -69,8 +92,11 @@ class SurfaceCanva(_AbstractCanva):
 
     @surface.setter
     def surface(self, value: pygame.Surface):
+        rect = value.get_rect()
+        if value is not getattr(self, "_surface", None) or rect != self._rect:
+            self._dirty_full = True
         self._surface = value
-        self._rect = value.get_rect()
+        self._rect = rect
 
     def _get_clip(self) -> pygame.Rect:
         return self._surface.get_clip()
@@ -118,24 +144,100 @@ class SurfaceCanva(_AbstractCanva):
     def _blit(self, source, dest, special_flags=0):
         self._surface.blit(source, dest, special_flags=special_flags)
 
+    def _blit_areas(self, source, blits, special_flags=0):
+        self._surface.blits(
+            [(source, dest, area, special_flags) for dest, area in blits], False
+        )
+
     def _clear(self, color, window):
         window.get_surface().fill(color)
 
     def _flip(self, window):
         window.flip()
 
+    def _flip_rects(self, window, rects):
+        if window.get_surface() is pygame.display.get_surface():
+            pygame.display.update(rects)
+        else:
+            window.flip()
+
+    def _retain_ready(self) -> bool:
+        return (
+            self._retained is not None
+            and self._retained.size == self._surface.size
+            and self._retained.get_flags() & pygame.SRCALPHA
+            == self._surface.get_flags() & pygame.SRCALPHA
+        )
+
+    def _retain_end(self):
+        if self._retain_ready():
+            self._retained.blit(self._surface, (0, 0))
+        else:
+            self._retained = self._surface.copy()
+
+    def _retain_reuse(self):
+        self._surface.set_clip(None)
+        if self._retained.get_flags() & pygame.SRCALPHA:
+            # alpha blitting would blend the pixels instead of copying them
+            self._surface.fill((0, 0, 0, 0))
+            self._surface.blit(
+                self._retained, (0, 0), special_flags=pygame.BLEND_RGBA_MAX
+            )
+        else:
+            self._surface.blit(self._retained, (0, 0))
+
+    def _retain_release(self):
+        self._retained = None
+
+    def _layer_target(self, old, size):
+        if isinstance(old, pygame.Surface) and old.size == size:
+            return old
+        return pygame.Surface(size, pygame.SRCALPHA)
+
+    def _layer_begin(self, target):
+        previous = self._surface
+        self._surface = target
+        target.set_clip(None)
+        target.fill((0, 0, 0, 0))
+        return previous
+
+    def _layer_end(self, previous):
+        self._surface = previous
+
+    def _layer_blit(self, target, dest, alpha):
+        target.set_alpha(alpha)
+        self._surface.blit(target, dest)
+
 
 class RendererCanva(_AbstractCanva):
     backend = "renderer"
 
-    def __init__(self, renderer: pgvideo.Renderer, shape_cache_lifetime: int = 1000):
+    def __init__(
+        self,
+        renderer: pgvideo.Renderer,
+        shape_cache_lifetime: int = 1000,
+        shape_cache_budget: int = 32 * 1024 * 1024,
+    ):
+        self._shape_cache: OrderedDict[tuple, tuple[pgvideo.Texture, int, int]] = (
+            OrderedDict()
+        )
+        self._shape_cache_bytes = 0
+        self._shape_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._now = pygame.time.get_ticks()
+        self._clip: pygame.Rect | None = None
+        self._viewport: pygame.Rect | None = None
+        self._viewport_valid = False
         self.renderer = renderer
         self.shape_cache_lifetime = shape_cache_lifetime
+        self.shape_cache_budget = shape_cache_budget
         self._offset = pygame.Vector2()
-        self._shape_cache = {}
+        self._retained: pgvideo.Texture | None = None
+        self._retained_target = None
 
     @property
     def renderer(self):
+        # custom components drawing on the renderer expect the current clip
+        self._apply_clip()
         return self._renderer
 
     @renderer.setter
@@ -143,17 +245,72 @@ class RendererCanva(_AbstractCanva):
         self._renderer = value
         self._rect = value.get_viewport()
         self._topleft = pygame.Vector2(self._rect.topleft)
+        self._clip = None
+        self._viewport_valid = False
+        self.clear_shape_cache()
+
+    @property
+    def shape_cache_stats(self) -> dict[str, int]:
+        return {
+            **self._shape_cache_stats,
+            "entries": len(self._shape_cache),
+            "bytes": self._shape_cache_bytes,
+        }
+
+    def clear_shape_cache(self):
+        self._shape_cache.clear()
+        self._shape_cache_bytes = 0
+
+    def _get_shape(self, key):
+        entry = self._shape_cache.get(key, None)
+        if entry is None:
+            self._shape_cache_stats["misses"] += 1
+            return None
+        self._shape_cache_stats["hits"] += 1
+        self._shape_cache.move_to_end(key)
+        if entry[2] != self._now:
+            self._shape_cache[key] = (entry[0], entry[1], self._now)
+        return entry[0]
+
+    def _add_shape(self, key, surf):
+        texture = pgvideo.Texture.from_surface(self._renderer, surf)
+        size = surf.width * surf.height * 4
+        self._shape_cache[key] = (texture, size, self._now)
+        self._shape_cache_bytes += size
+        while self._shape_cache_bytes > self.shape_cache_budget:
+            self._pop_shape()
+        return texture
+
+    def _pop_shape(self):
+        _, (_, size, _) = self._shape_cache.popitem(last=False)
+        self._shape_cache_bytes -= size
+        self._shape_cache_stats["evictions"] += 1
 
     @property
     def offset(self):
         return pygame.Vector2()
 
     def _get_clip(self) -> pygame.Rect:
-        return self._renderer.get_viewport()
+        if self._clip is None:
+            return self._renderer.get_viewport()
+        return self._clip.copy()
 
     def _set_clip(self, rect: pygame.Rect):
-        self._renderer.set_viewport(rect)
-        self._topleft = pygame.Vector2(rect.topleft)
+        # the viewport is only changed when something is drawn with a different clip
+        self._clip = pygame.Rect(rect)
+        self._topleft = pygame.Vector2(self._clip.topleft)
+
+    def _apply_clip(self):
+        if self._viewport_valid and self._viewport == self._clip:
+            return
+        self._renderer.set_viewport(self._clip)
+        self._viewport = self._clip
+        self._viewport_valid = True
+
+    def _reset_clip(self):
+        self._clip = None
+        self._topleft = pygame.Vector2()
+        self._apply_clip()
 
     def _get_image(self, surface, old=None):
         if (
@@ -176,33 +333,58 @@ class RendererCanva(_AbstractCanva):
         except TypeError:
             dest = pygame.Rect(dest, (source.width, source.height))
         dest.topleft -= self._topleft
+        self._apply_clip()
         try:
             self._renderer.blit(source, dest, special_flags=special_flags)
         except Exception as e:
             print(e, source)
 
+    def _blit_areas(self, source, blits, special_flags=0):
+        if not isinstance(source, pgvideo.Texture):
+            return
+        if source.renderer is not self._renderer:
+            return
+        self._apply_clip()
+        tx, ty = self._topleft
+        blit = self._renderer.blit
+        for (x, y), area in blits:
+            blit(
+                source, pygame.Rect(x - tx, y - ty, area.w, area.h), area, special_flags
+            )
+
     def _draw_line(self, color, start, end, width=1):
+        self._apply_clip()
         self._renderer.draw_color = color
         offset_start = start - self._topleft
         offset_end = end - self._topleft
         if width == 1:
             self._renderer.draw_line(offset_start, offset_end)
         else:
-            dx = abs(end[0] - start[0])
-            dy = abs(end[1] - start[1])
-            for i in range(width):
-                offset = i - width // 2
-                if dx >= dy:
-                    offset = (0, offset)
-                else:
-                    offset = (offset, 0)
-                self._renderer.draw_line(offset_start + offset, offset_end + offset)
+            # a single quad covering the same pixels as width offset lines
+            dx = end[0] - start[0]
+            dy = end[1] - start[1]
+            if abs(dx) >= abs(dy):
+                if dx < 0:
+                    offset_start, offset_end = offset_end, offset_start
+                a = pygame.Vector2(0, -(width // 2))
+                b = pygame.Vector2(0, width - width // 2)
+                offset_end = offset_end + (1, 0)
+            else:
+                if dy < 0:
+                    offset_start, offset_end = offset_end, offset_start
+                a = pygame.Vector2(-(width // 2), 0)
+                b = pygame.Vector2(width - width // 2, 0)
+                offset_end = offset_end + (0, 1)
+            self._renderer.fill_quad(
+                offset_start + a, offset_end + a, offset_end + b, offset_start + b
+            )
 
     _draw_aaline = _draw_line
 
     def _draw_rect(self, color, rect, width=0, br=-1, c1=-1, c2=-1, c3=-1, c4=-1):
         r = pygame.Rect(rect)
         r.topleft -= self._topleft
+        self._apply_clip()
         if br <= 0 and c1 == -1 and c2 == -1 and c3 == -1 and c4 == -1:
             self._renderer.draw_color = color
             if width == 0:
@@ -215,21 +397,14 @@ class RendererCanva(_AbstractCanva):
                 self._renderer.fill_rect((r.right - width, r.y, width, r.h))
                 self._renderer.fill_rect((r.x, r.bottom - width, r.w, width))
         else:
-            cache_key = f"{color}_{r.w}_{r.h}_{width}_{br}_{c1}_{c2}_{c3}_{c4}"
-            now = pygame.time.get_ticks()
-            if cache_key in self._shape_cache:
-                texture, last = self._shape_cache[cache_key]
-            else:
+            cache_key = (0, _color_key(color), r.w, r.h, width, br, c1, c2, c3, c4)
+            texture = self._get_shape(cache_key)
+            if texture is None:
                 surf = pygame.Surface(r.size, pygame.SRCALPHA)
                 pygame.draw.rect(
                     surf, color, ((0, 0), r.size), width, br, c1, c2, c3, c4
                 )
-                texture = pgvideo.Texture.from_surface(self._renderer, surf)
-            if texture.renderer is not self._renderer:
-                if cache_key in self._shape_cache:
-                    del self._shape_cache[cache_key]
-                return
-            self._shape_cache[cache_key] = (texture, now)
+                texture = self._add_shape(cache_key, surf)
             self._renderer.blit(texture, r)
 
     def _draw_circle(
@@ -244,21 +419,25 @@ class RendererCanva(_AbstractCanva):
         c3=False,
         c4=False,
     ):
-        cache_key = f"{antialias}_{color}_{radius}_{width}_{c1}_{c2}_{c3}_{c4}"
-        now = pygame.time.get_ticks()
-        if cache_key in self._shape_cache:
-            texture, last = self._shape_cache[cache_key]
-        else:
+        cache_key = (
+            1,
+            _color_key(color),
+            antialias,
+            radius,
+            width,
+            c1,
+            c2,
+            c3,
+            c4,
+        )
+        self._apply_clip()
+        texture = self._get_shape(cache_key)
+        if texture is None:
             surf = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
             (pygame.draw.aacircle if antialias else pygame.draw.circle)(
                 surf, color, (radius, radius), radius, width, c1, c2, c3, c4
             )
-            texture = pgvideo.Texture.from_surface(self._renderer, surf)
-        if texture.renderer is not self._renderer:
-            if cache_key in self._shape_cache:
-                del self._shape_cache[cache_key]
-            return
-        self._shape_cache[cache_key] = (texture, now)
+            texture = self._add_shape(cache_key, surf)
         self._renderer.blit(
             texture,
             pygame.Rect(
@@ -272,19 +451,13 @@ class RendererCanva(_AbstractCanva):
     def _draw_ellipse(self, color, rect, outline=0):
         r = pygame.Rect(rect)
         r.topleft -= self._topleft
-        cache_key = f"{color}_{r.w}_{r.h}_{outline}"
-        now = pygame.time.get_ticks()
-        if cache_key in self._shape_cache:
-            texture, last = self._shape_cache[cache_key]
-        else:
+        cache_key = (2, _color_key(color), r.w, r.h, outline)
+        self._apply_clip()
+        texture = self._get_shape(cache_key)
+        if texture is None:
             surf = pygame.Surface(r.size, pygame.SRCALPHA)
             pygame.draw.ellipse(surf, color, (0, 0, r.w, r.h), outline)
-            texture = pgvideo.Texture.from_surface(self._renderer, surf)
-        if texture.renderer is not self._renderer:
-            if cache_key in self._shape_cache:
-                del self._shape_cache[cache_key]
-            return
-        self._shape_cache[cache_key] = (texture, now)
+            texture = self._add_shape(cache_key, surf)
         self._renderer.blit(
             texture,
             r,
@@ -295,19 +468,13 @@ class RendererCanva(_AbstractCanva):
             return
         r = pygame.Rect(rect)
         r.topleft -= self._topleft
-        cache_key = f"{color}_{points}_{width}"
-        now = pygame.time.get_ticks()
-        if cache_key in self._shape_cache:
-            texture, last = self._shape_cache[cache_key]
-        else:
+        cache_key = (3, _color_key(color), r.w, r.h, tuple(map(tuple, points)), width)
+        self._apply_clip()
+        texture = self._get_shape(cache_key)
+        if texture is None:
             surf = pygame.Surface(r.size, pygame.SRCALPHA)
             pygame.draw.polygon(surf, color, points, width)
-            texture = pgvideo.Texture.from_surface(self._renderer, surf)
-        if texture.renderer is not self._renderer:
-            if cache_key in self._shape_cache:
-                del self._shape_cache[cache_key]
-            return
-        self._shape_cache[cache_key] = (texture, now)
+            texture = self._add_shape(cache_key, surf)
         self._renderer.blit(
             texture,
             r,
@@ -323,9 +490,78 @@ class RendererCanva(_AbstractCanva):
     def _start(self):
         self._rect = self._renderer.get_viewport()
         self._topleft = pygame.Vector2(self._rect.topleft)
-        for name, (shape, last) in list(self._shape_cache.items()):
-            if pygame.time.get_ticks() - last >= self.shape_cache_lifetime:
-                del self._shape_cache[name]
+        self._clip = self._viewport = self._rect
+        self._viewport_valid = True
+        self._now = pygame.time.get_ticks()
+        cache = self._shape_cache
+        while cache and self._now - next(iter(cache.values()))[2] >= (
+            self.shape_cache_lifetime
+        ):
+            self._pop_shape()
 
     def _end(self):
-        self._renderer.set_viewport(None)
+        self._reset_clip()
+
+    def _retain_size(self):
+        return (max(self._rect.right, 1), max(self._rect.bottom, 1))
+
+    def _retain_ready(self) -> bool:
+        return (
+            self._retained is not None
+            and self._retained.renderer is self._renderer
+            and self._retained.get_rect().size == self._retain_size()
+        )
+
+    def _retain_begin(self):
+        if not self._retain_ready():
+            self._retained = pgvideo.Texture(
+                self._renderer, self._retain_size(), target=True
+            )
+            self._retained.blend_mode = pygame.BLENDMODE_BLEND
+        self._retained_target = self._renderer.target
+        self._renderer.target = self._retained
+        self._viewport_valid = False
+        self._renderer.draw_color = (0, 0, 0, 0)
+        self._renderer.clear()
+
+    def _retain_end(self):
+        self._reset_clip()
+        self._renderer.target = self._retained_target
+        self._retained_target = None
+        self._viewport_valid = False
+        self._retain_reuse()
+
+    def _retain_reuse(self):
+        self._reset_clip()
+        self._renderer.blit(self._retained, self._retained.get_rect())
+
+    def _retain_release(self):
+        self._retained = None
+
+    def _layer_target(self, old, size):
+        if (
+            isinstance(old, pgvideo.Texture)
+            and old.renderer is self._renderer
+            and (old.width, old.height) == tuple(size)
+        ):
+            return old
+        target = pgvideo.Texture(self._renderer, size, target=True)
+        target.blend_mode = pygame.BLENDMODE_BLEND
+        return target
+
+    def _layer_begin(self, target):
+        previous = (self._renderer.target, self._topleft, self._clip)
+        self._renderer.target = target
+        self._viewport_valid = False
+        self._reset_clip()
+        self._renderer.draw_color = (0, 0, 0, 0)
+        self._renderer.clear()
+        return previous
+
+    def _layer_end(self, previous):
+        self._renderer.target, self._topleft, self._clip = previous
+        self._viewport_valid = False
+
+    def _layer_blit(self, target, dest, alpha):
+        target.alpha = alpha
+        self._blit(target, (dest, (target.width, target.height)))
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 
 if typing.TYPE_CHECKING:
     from mili import MILI as _MILI
+    from mili import _core
 
 __all__ = (
     "ImageCache",
@@ -12,6 +13,7 @@ __all__ = (
     "ImageLayerCache",
     "Interaction",
     "ElementData",
+    "InputSnapshot",
 )
 
 
@@ -26,12 +28,7 @@ class ParentCache:
 
     def refresh(self):
         self._rebuild = True
-        self._cache = {
-            "children": [],
-            "children_grid": [],
-            "children_fillx": [],
-            "children_filly": [],
-        }
+        self._cache = None
         self._grid = None
 
 
@@ -151,6 +148,15 @@ class TextCache:
         return cls._preallocated_caches[cls._preallocated_index]
 
 
+@dataclass(frozen=True, slots=True)
+class InputSnapshot:
+    position: tuple[float, float]
+    pressed: tuple[bool, ...]
+    just_pressed: tuple[bool, ...]
+    just_released: tuple[bool, ...]
+    wheel: tuple[float, float] = (0, 0)
+
+
 @dataclass(slots=True)
 class ElementGridData:
     overflowx: float
@@ -188,7 +194,7 @@ class ElementData:
     @property
     def children_ids(self) -> list[int]:
         if self._children_ids is None:
-            self._children_ids = [el["id"] for el in self._children]
+            self._children_ids = [el.id for el in self._children]
         return self._children_ids
 
 
@@ -202,7 +208,7 @@ class Interaction:
     absolute_hover: bool
     unhover_pressed: bool
     _just_hover: int
-    _raw_data: dict[str, typing.Any]
+    _raw_data: "_core._Element"
     _data: ElementData | None = None
     _did_begin: bool = False
     parent: "Interaction|None" = None
@@ -10,6 +10,7 @@ from mili import canva as _canva
 from mili import icon as _icon
 from mili import _coreutils
 from mili import _richtext
+from mili import _glyphs
 from mili import error as _error
 from mili import data as _data
 from mili import typing as _typing
@@ -23,6 +24,16 @@ __all__ = (
     "pack_component",
     "get_font_cache",
     "clear_font_cache",
+    "get_text_cache_stats",
+    "clear_text_cache",
+    "set_text_cache_budget",
+    "clear_glyph_cache",
+    "get_image_cache_stats",
+    "clear_image_cache",
+    "set_image_cache_budget",
+    "get_markdown_image_cache_stats",
+    "clear_markdown_image_cache",
+    "set_markdown_image_cache_budget",
     "set_number_modifier",
     "smart_number",
 )
@@ -62,6 +73,48 @@ def clear_font_cache():
     _core._globalctx._font_cache = {}
 
 
+def get_text_cache_stats() -> dict[str, int]:
+    return _core._globalctx._text_cache.stats()
+
+
+def clear_text_cache():
+    _core._globalctx._text_cache.clear()
+    _richtext._parse_cache.clear()
+
+
+def set_text_cache_budget(budget: int):
+    _core._globalctx._text_cache.budget = budget
+
+
+def clear_glyph_cache():
+    _glyphs._clear()
+
+
+def get_image_cache_stats() -> dict[str, int]:
+    return _core._globalctx._image_cache.stats()
+
+
+def clear_image_cache():
+    _core._globalctx._image_cache.clear()
+
+
+def set_image_cache_budget(budget: int):
+    _core._globalctx._image_cache.budget = budget
+
+
+def get_markdown_image_cache_stats() -> dict[str, int]:
+    return _richtext._md_image_cache.stats()
+
+
+def clear_markdown_image_cache():
+    _richtext._md_image_cache.clear()
+    _richtext._md_image_failed.clear()
+
+
+def set_markdown_image_cache_budget(budget: int):
+    _richtext._md_image_cache.budget = budget
+
+
 def register_update_id(
     update_id: str | None, function: typing.Callable[[_data.Interaction], None]
 ):
@@ -70,13 +123,22 @@ def register_update_id(
 
 class MarkDown:
     def __init__(
-        self, source: str, style: _typing.MarkDownStyleLike | dict | None = None
+        self,
+        source: str,
+        style: _typing.MarkDownStyleLike | dict | None = None,
+        ready_callback: typing.Callable[[], typing.Any] | None = None,
     ):
         self._source = source
+        self.ready_callback = ready_callback
+        self._parse_id = 0
+        self._ready_id = 0
         self._any_hover = False
         self._parse_result: None | list = None
-        self._images = {}
+        self._checkpoint: tuple | None = None
         self._heights = {}
+        self._extents = {}
+        self._index: tuple | None = None
+        self._window: tuple | None = None
         if style is None:
             style = {}
         copy = style.get("code_copy_style", {})
@@ -134,6 +196,7 @@ class MarkDown:
             "load_images_async": style.get("load_images_async", True),
             "link_handler": style.get("link_handler", webbrowser.open),
             "parse_async": style.get("parse_async", True),
+            "cache_dir": style.get("cache_dir", None),
         }
         self.rebuild()
 
@@ -143,22 +206,45 @@ class MarkDown:
 
     @source.setter
     def source(self, value):
-        changed = False
-        if self._source != value:
-            changed = True
+        if self._source == value:
+            return
+        if value.startswith(self._source):
+            self.append(value[len(self._source) :])
+            return
         self._source = value
-        if changed:
+        self.rebuild()
+
+    def append(self, text: str):
+        if not text:
+            return
+        self._source += text
+        if self._checkpoint is None:
             self.rebuild()
+            return
+        self._parse(self._checkpoint)
+
+    @property
+    def parsing(self) -> bool:
+        return self._ready_id != self._parse_id
 
     def rebuild(self):
+        self._parse(None)
+
+    def _parse(self, checkpoint):
+        self._parse_id += 1
         if self.style["parse_async"]:
             thread = threading.Thread(
-                target=_richtext._markdown_parse, args=(self._source, self)
+                target=_richtext._markdown_parse_async,
+                args=(self, self._parse_id, self._source, checkpoint),
             )
             thread.daemon = True
             thread.start()
         else:
-            _richtext._markdown_parse(self._source, self)
+            _richtext._markdown_apply(
+                self,
+                self._parse_id,
+                _richtext._markdown_parse(self._source, self.style, checkpoint),
+            )
 
     def _link_hover(self, dt):
         self._any_hover = True
@@ -190,11 +276,11 @@ class MILI:
 
     @property
     def stack_id(self) -> int:
-        return self._ctx._stack["id"]
+        return self._ctx._stack.id
 
     @property
     def current_parent_id(self) -> int:
-        return self._ctx._parent["id"] if self._ctx._parent else -1
+        return self._ctx._parent.id if self._ctx._parent else -1
 
     @property
     def all_elements_ids(self) -> list[int]:
@@ -219,12 +305,37 @@ class MILI:
     @use_global_mouse.setter
     def use_global_mouse(self, v: bool):
         self._ctx._global_mouse = v
-        if v:
-            self._ctx._get_just_pressed_func = self._ctx._get_just_pressed
-            self._ctx._get_just_released_func = self._ctx._get_just_released
-        else:
-            self._ctx._get_just_pressed_func = pygame.mouse.get_just_pressed
-            self._ctx._get_just_released_func = pygame.mouse.get_just_released
+
+    @property
+    def input(self) -> _data.InputSnapshot:
+        return self._ctx._input
+
+    def set_input(
+        self,
+        position: pygame.typing.Point,
+        pressed: typing.Sequence[bool] = (),
+        wheel: pygame.typing.Point = (0, 0),
+    ):
+        self._ctx._next_input = (position, pressed, wheel)
+
+    @property
+    def retained_mode(self) -> bool:
+        return self._ctx._retained
+
+    @retained_mode.setter
+    def retained_mode(self, v: bool):
+        if v == self._ctx._retained:
+            return
+        self._ctx._retained = v
+        self._ctx._settled = False
+        self._ctx._frame_stream = []
+        self._ctx._frame_elements = []
+        if not v and self._ctx._canva is not None:
+            self._ctx._canva._retain_release()
+
+    @property
+    def frame_reused(self) -> bool:
+        return self._ctx._frame_reused
 
     def default_style(self, type: str, style: _typing.AnyStyleLike):
         if type != "element" and type not in _core._globalctx._component_types:
@@ -233,6 +344,7 @@ class MILI:
             if type not in self._ctx._default_styles:
                 self._ctx._default_styles[type] = {}
         self._ctx._default_styles[type].update(style)
+        self._ctx._styles_version += 1
 
     def default_styles(self, **types_styles: _typing.AnyStyleLike):
         for name, value in types_styles.items():
@@ -243,6 +355,7 @@ class MILI:
             if tp != "element" and tp not in _core._globalctx._component_types:
                 raise _error.MILIValueError("Invalid style type")
             self._ctx._default_styles[tp] = {}
+        self._ctx._styles_version += 1
 
     def push_styles(self, **types_styles: _typing.AnyStyleLike):
         self._ctx._styles_stack.append(copy.deepcopy(self._ctx._styles))
@@ -280,21 +393,40 @@ class MILI:
             style = style.copy()
             style["blocking"] = False
         self._ctx._start(style, window_position)
+        _richtext._markdown_swap()
         if is_global:
             _data.ImageCache._preallocated_index = -1
             _data.TextCache._preallocated_index = -1
         return True
 
-    def update_draw(self):
-        self._ctx._organize_element(self._ctx._stack)
-        self._ctx._started = False
-        self._ctx._draw_update_element(self._ctx._stack, (0, 0))
-        if self._ctx._canva.backend == "surface":
-            for layer_cache in self._ctx._image_layer_caches:
-                _core._coreutils._render_layer_cache(layer_cache, self._ctx._canva._surface)
-        abs_hovered = sorted(self._ctx._abs_hovered, key=lambda e: e["z"], reverse=True)
-        if len(abs_hovered) > 0:
-            abs_hovered[0]["top"] = True
+    def update_draw(self) -> list[pygame.Rect] | None:
+        dirty = None
+        self._ctx._frame_reused = self._ctx._retained and self._ctx._retained_unchanged()
+        if self._ctx._frame_reused:
+            self._ctx._started = False
+            self._ctx._reuse_frame()
+            self._ctx._canva._retain_reuse()
+            if self._ctx._canva.track_dirty:
+                dirty = []
+        else:
+            self._ctx._organize_element(self._ctx._stack)
+            self._ctx._started = False
+            if self._ctx._retained:
+                self._ctx._canva._retain_begin()
+            self._ctx._spatial.clear()
+            if self._ctx._canva.track_dirty:
+                dirty = self._ctx._draw_dirty()
+            else:
+                self._ctx._draw_update_element(self._ctx._stack, (0, 0))
+            if self._ctx._canva.backend == "surface":
+                for layer_cache in self._ctx._image_layer_caches:
+                    _core._coreutils._render_layer_cache(layer_cache, self._ctx._canva._surface)
+            abs_hovered = self._ctx._spatial.at(self._ctx._mouse_pos, True)
+            if len(abs_hovered) > 0:
+                abs_hovered[0].top = True
+            if self._ctx._retained:
+                self._ctx._retain_frame(abs_hovered[0] if len(abs_hovered) > 0 else None)
+                self._ctx._canva._retain_end()
         if len(_core._globalctx._mili_stack) > 0:
             _core._globalctx._mili_stack.pop()
         if len(_core._globalctx._mili_stack) > 0:
@@ -304,6 +436,7 @@ class MILI:
         if self._ctx._cleared > 0:
             self._ctx._cleared -= 1
         self._ctx._canva._end()
+        return dirty
 
     def markdown(self, markdown: MarkDown):
         if markdown.style["change_cursor"]:
@@ -322,7 +455,7 @@ class MILI:
         interaction._did_begin = False
         interaction.parent = self.current_parent_interaction
         self.last_interaction = interaction
-        if uid := self._ctx._style_val(el["style"], "element", "update_id", None):
+        if uid := el.cstyle.update_id:
             uids = [uid]
             if not isinstance(uid, str):
                 uids = uid
@@ -344,7 +477,7 @@ class MILI:
         self.last_interaction = self.current_parent_interaction = interaction
         self._ctx._parent = el
         self._ctx._parents_stack.append(el)
-        if uid := self._ctx._style_val(el["style"], "element", "update_id", None):
+        if uid := el.cstyle.update_id:
             uids = [uid]
             if not isinstance(uid, str):
                 uids = uid
@@ -372,20 +505,25 @@ class MILI:
                 raise _error.MILIValueError(
                     f"Cannot add style to inexistent element with ID {element_id}"
                 )
-        element["style"].update(style)
+        element.style.update(style)
+        self._ctx._compile_element_style(element, True)
+        if self._ctx._retained:
+            self._ctx._frame_stream.append((element.id, style.copy()))
         if "z" in style:
-            element["z"] = style["z"]
+            element.z = style["z"]
 
     def end(self):
         self._ctx._start_check()
         parent = self._ctx._parent
-        if parent and parent["id"] != 0:
+        if parent and parent.id != 0:
             self._ctx._organize_element(parent)
-            if parent["id"] == self._ctx._inside_cache:
+            if parent.id == self._ctx._inside_cache:
                 self._ctx._inside_cache = -1
                 self._ctx._static_cache = False
         else:
             raise _error.MILIStatusError("end() called too many times")
+        if self._ctx._retained:
+            self._ctx._frame_stream.append(None)
         if len(self._ctx._parents_stack) > 1:
             self._ctx._parents_stack.pop()
             self._ctx._parent = self._ctx._parents_stack[-1]
@@ -629,23 +767,24 @@ class MILI:
         elif element_id == 0:
             return _core._coreutils._element_data(self._ctx, self._ctx._stack)
 
+    def elements_at(self, point: pygame.typing.Point) -> list[int]:
+        return [element.id for element in self._ctx._spatial.at(point)]
+
+    def elements_in(self, rect: pygame.typing.RectLike) -> list[int]:
+        return [element.id for element in self._ctx._spatial.within(pygame.Rect(rect))]
+
     def clear_memory(self, keep_ids: list[int] | None = None):
         ctx = self._ctx
         ctx._cleared = 3
         memory_keep = {}
-        old_data_keep = {}
         if keep_ids:
             for _id in keep_ids:
                 if _id in ctx._memory:
                     memory_keep[_id] = ctx._memory[_id]
-                if _id in ctx._old_data:
-                    old_data_keep[_id] = ctx._old_data[_id]
         ctx._memory.clear()
-        ctx._old_data.clear()
         ctx._interaction_cache.clear()
         if keep_ids:
             ctx._memory.update(memory_keep)
-            ctx._old_data.update(old_data_keep)
 
     def id_checkpoint(self, id_: int):
         if id_ < 1:
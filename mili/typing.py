@@ -114,6 +114,7 @@ class MarkDownStyleLike(typing.TypedDict):
     load_images_async: bool
     link_handler: typing.Callable[[str], None]|None
     parse_async: bool
+    cache_dir: str | None
 
 
 class _UIAppButtonStyleLike(typing.TypedDict):
@@ -276,6 +277,8 @@ class _ElementStyleLike(typing.TypedDict):
     parent_flag: int
     cache_rect_size: bool
     cache: _data.ParentCache | None
+    layer: bool
+    layer_alpha: int
 
     axis: typing.Literal["x", "y"]
     spacing: SmartNumberOrPercentage
@@ -387,11 +390,13 @@ class _TextStyleLike(_ComponentStyleLike):
     growy: bool
     wraplen: SmartNumberOrPercentage
     slow_grow: bool
+    glyph_atlas: bool
     rich: bool
     rich_aligny: typing.Literal["top", "center", "bottom"]
     rich_linespace: int
     rich_actions: dict[str, typing.Callable[[typing.Any], None]]
     rich_link_color: pygame.typing.ColorLike
+    rich_outline_size: int
     rich_markdown: bool
     rich_markdown_style: _TextRichMarkdownStyleLike
 
@@ -400,7 +405,7 @@ type TextStyleLike = _TextStyleLike | dict[str, typing.Any]
 
 
 class _ImageStyleLike(_ComponentStyleLike):
-    cache: _data.ImageCache | None
+    cache: _data.ImageCache | typing.Literal["auto", False] | None
     layer_cache: _data.ImageLayerCache | None
     fill: bool
     stretchx: bool
@@ -442,7 +447,7 @@ class ComponentProtocol(typing.Protocol):
         ctx: "_core._ctx",
         data: typing.Any,
         style: dict[str, typing.Any],
-        element: dict[str, typing.Any],
+        element: "_core._Element",
         absolute_rect: pygame.Rect,
     ): ...
 
@@ -451,7 +456,7 @@ class ComponentProtocol(typing.Protocol):
         ctx: "_core._ctx",
         data: typing.Any,
         style: dict[str, typing.Any],
-        element: dict[str, typing.Any],
+        element: "_core._Element",
     ): ...
 
 
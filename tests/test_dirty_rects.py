@@ -0,0 +1,33 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import mili
+
+
+def _draw(track_dirty):
+    surface = pygame.Surface((200, 150))
+    canva = mili.SurfaceCanva(surface, track_dirty, (10, 10, 10))
+    ui = mili.MILI(canva)
+    for frame in range(3):
+        if not track_dirty:
+            surface.fill((10, 10, 10))
+        ui.start({"pad": 3, "spacing": 3})
+        # the child overflows its non clipping parent onto the next sibling
+        with ui.begin((0, 0, 190, 30), {"clip_draw": False, "z": 1}):
+            ui.element(
+                (0, 0, 60, 80), {"z": 20, "ignore_grid": True, "offset": (10, 5)}
+            )
+            ui.rect({"color": (200, 0, 0)})
+        ui.element((0, 0, 100, 60), {"z": 0})
+        ui.rect({"color": (0, 80, 0)})
+        ui.text(f"x{frame}", {"size": 30})
+        ui.update_draw()
+    return surface
+
+
+def test_dirty_rects_redraw_overflowing_children():
+    pygame.init()
+    full, dirty = _draw(False), _draw(True)
+    assert pygame.image.tobytes(full, "RGB") == pygame.image.tobytes(dirty, "RGB")